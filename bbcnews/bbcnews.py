@@ -1,11 +1,22 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import aiohttp
+try:
+    # Where Red's Downloader installs the repo's shared library
+    from cog_shared.senkohttp import acquire, release
+except ModuleNotFoundError as e:
+    if not (e.name or "").startswith("cog_shared"):
+        raise
+    # Development checkout, the library sits next to the cogs
+    from senkohttp import acquire, release
 
 class BBCNews(commands.Cog):  # Ensure inheritance from commands.Cog
     def __init__(self, bot):
         self.bot = bot
+        self.http = acquire(bot)
+
+    async def cog_unload(self):
+        await release(self.bot)
 
     # Function to fetch the latest BBC News
     async def fetch_bbc_news(self):
@@ -15,14 +26,10 @@ class BBCNews(commands.Cog):  # Ensure inheritance from commands.Cog
             'sources': 'bbc-news',
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    articles = data['articles']
-                    return articles
-                else:
-                    return None
+        data = await self.http.get_json(url, params=params)
+        if data:
+            return data.get('articles')
+        return None
 
     # Slash command to get the latest BBC news
     @app_commands.command(name="bbc_news", description="Get the latest news from BBC")
@@ -0,0 +1,38 @@
+"""Helpers shared by the benchmark scripts (ytdl.bench, localcontrol.loadtest).
+
+Development only, not part of any cog. The scripts are run from the repo root with
+``python -m``, which puts this module on the import path.
+"""
+import asyncio
+import os
+import subprocess
+import time
+
+
+class LoopMonitor:
+    """Measures how long the event loop was blocked, from how late short sleeps wake up."""
+
+    def __init__(self, interval: float = 0.01, threshold: float = 0.005):
+        self.interval = interval
+        self.threshold = threshold
+        self.blocked = 0.0
+        self.max_lag = 0.0
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - start - self.interval
+            if lag > self.threshold:
+                self.blocked += lag
+            self.max_lag = max(self.max_lag, lag)
+
+
+def revision() -> str:
+    """Git commit the checkout is at, so reports from different revisions can be told apart."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip() or None
+    except OSError:
+        return None
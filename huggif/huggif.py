@@ -1,27 +1,42 @@
 import discord
 from redbot.core import commands
-import aiohttp
+try:
+    # Where Red's Downloader installs the repo's shared library
+    from cog_shared.senkohttp import PrefetchPool, acquire, json_fetcher, release
+except ModuleNotFoundError as e:
+    if not (e.name or "").startswith("cog_shared"):
+        raise
+    # Development checkout, the library sits next to the cogs
+    from senkohttp import PrefetchPool, acquire, json_fetcher, release
+
+HUG_URL = "https://nekos.life/api/v2/img/hug"
 
 class HugGif(commands.Cog):
     """Sends a hug GIF from nekos.life API"""
     
     def __init__(self, bot):
         self.bot = bot
+        self.http = acquire(bot)
+        # Keeps a few hug GIFs ready so the command doesn't wait on nekos.life
+        self.prefetch = PrefetchPool(json_fetcher(self.http))
+
+    async def cog_unload(self):
+        await self.prefetch.close()
+        await release(self.bot)
 
     @commands.command()
     async def nekohug(self, ctx, user: discord.Member = None):
         """Send a random hug GIF. Optionally mention a user."""
-        url = "https://nekos.life/api/v2/img/hug"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                if resp.status != 200:
-                    await ctx.send("Couldn't fetch a hug GIF right now. Try again later.")
-                    return
-                data = await resp.json()
-                gif_url = data.get("url")
-                if not gif_url:
-                    await ctx.send("API returned an invalid response.")
-                    return
+        data = self.prefetch.pop(HUG_URL)
+        if data is None:
+            data = await self.http.get_json(HUG_URL)
+        if data is None:
+            await ctx.send("Couldn't fetch a hug GIF right now. Try again later.")
+            return
+        gif_url = data.get("url") if isinstance(data, dict) else None
+        if not gif_url:
+            await ctx.send("API returned an invalid response.")
+            return
 
         embed = discord.Embed(color=discord.Color.pink())
         if user:
@@ -1,6 +1,13 @@
-import requests
 import xml.etree.ElementTree as ET
 from redbot.core import commands
+try:
+    # Where Red's Downloader installs the repo's shared library
+    from cog_shared.senkohttp import HttpError, acquire, release
+except ModuleNotFoundError as e:
+    if not (e.name or "").startswith("cog_shared"):
+        raise
+    # Development checkout, the library sits next to the cogs
+    from senkohttp import HttpError, acquire, release
 import os
 import subprocess
 
@@ -14,6 +21,10 @@ class IonTvSchedule(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.http = acquire(bot)
+
+    async def cog_unload(self):
+        await release(self.bot)
 
     @commands.command()
     async def ionschedule(self, ctx):
@@ -23,13 +34,15 @@ class IonTvSchedule(commands.Cog):
         # Download script
         script_path = os.path.join(os.path.dirname(__file__), "zap2it-GuideScrape.py")
         try:
-            response = requests.get(self.SCRIPT_URL, timeout=10)
-            response.raise_for_status()  # Raise an error if the request failed
-            with open(script_path, "w", encoding="utf-8") as script_file:
-                script_file.write(response.text)
-        except requests.exceptions.RequestException as e:
+            response = await self.http.request("GET", self.SCRIPT_URL, read="text")
+        except HttpError as e:
             await ctx.send(f"Error downloading the guide scraper script: {e}")
             return
+        if response.status != 200:
+            await ctx.send(f"Error downloading the guide scraper script: HTTP {response.status}")
+            return
+        with open(script_path, "w", encoding="utf-8") as script_file:
+            script_file.write(response.data)
 
         # Ensure config file exists in the same directory as the script
         if not os.path.exists(self.CONFIG_FILE):
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+
+log = logging.getLogger("red.streamrelay")
+
+# channels.json is stat()ed this often to pick up edits made by hand
+RELOAD_CHECK_INTERVAL = 2
+# Changes are written this long after the last one, so a burst of !add is one write
+WRITE_DELAY = 1.0
+
+
+class ChannelRegistry:
+    """The channel name -> URL map, held in memory and persisted to channels.json.
+
+    Lookups and changes never touch the disk. The file is re-read in an executor
+    when its mtime changes, and changes are written behind, debounced, to a temp
+    file that then replaces channels.json, so a crash mid-write leaves the old
+    file intact. Changes that aren't written yet are kept on top of a reload.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.channels = {}
+        self.reloads = 0
+        self.writes = 0
+        self._mtime = None
+        self._dirty = False
+        # Changes made since the last write, re-applied over a reload of the file
+        self._pending = {}
+        self._write_task = None
+        self._watch_task = None
+        self._lock = asyncio.Lock()
+
+    # --- disk, called in an executor except for the initial load ---
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read(self) -> dict:
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("channels.json must be an object of {name: url}")
+        return {str(k): str(v) for k, v in data.items()}
+
+    def _write(self, data: dict):
+        folder = os.path.dirname(self.path)
+        fd, tmp = tempfile.mkstemp(prefix=".channels-", suffix=".json", dir=folder)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        return self._stat()
+
+    def load(self):
+        """Blocking load, creating an empty channels.json if there is none."""
+        if not os.path.exists(self.path):
+            self._mtime = self._write({})
+        try:
+            self.channels = self._read()
+        except (OSError, ValueError) as e:
+            log.error("Failed to load %s: %s", self.path, e)
+        self._mtime = self._stat()
+        self.reloads += 1
+
+    # --- background tasks ---
+    def start(self):
+        self._watch_task = asyncio.create_task(self._watch())
+
+    async def close(self):
+        """Stops watching and writes any pending change right away."""
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+        if self._write_task is not None and not self._write_task.done():
+            self._write_task.cancel()
+        if self._dirty:
+            await self._flush()
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(RELOAD_CHECK_INTERVAL)
+            mtime = await loop.run_in_executor(None, self._stat)
+            if mtime is None or mtime == self._mtime:
+                continue
+            async with self._lock:
+                try:
+                    channels = await loop.run_in_executor(None, self._read)
+                except (OSError, ValueError) as e:
+                    # Likely caught mid-edit, try again on the next check
+                    log.warning("Failed to reload %s: %s", self.path, e)
+                    continue
+                # !add calls that ran during the read (or aren't written yet) win over the file
+                channels.update(self._pending)
+                self.channels = channels
+                self._mtime = mtime
+                self.reloads += 1
+
+    async def _write_later(self):
+        # Keep going while changes (or a failed write) are still waiting
+        while True:
+            await asyncio.sleep(WRITE_DELAY)
+            await self._flush()
+            if not self._dirty:
+                return
+
+    async def _flush(self):
+        async with self._lock:
+            self._dirty = False
+            pending, self._pending = self._pending, {}
+            data = dict(self.channels)
+            try:
+                self._mtime = await asyncio.get_running_loop().run_in_executor(None, self._write, data)
+                self.writes += 1
+            except OSError as e:
+                self._dirty = True
+                self._pending = {**pending, **self._pending}
+                log.error("Failed to save %s: %s", self.path, e)
+
+    # --- in-memory access ---
+    def get(self, name: str, default=None):
+        return self.channels.get(name, default)
+
+    def names(self) -> list:
+        return list(self.channels)
+
+    def set(self, name: str, url: str):
+        self.channels[name] = url
+        self._pending[name] = url
+        self._dirty = True
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write_later())
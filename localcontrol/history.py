@@ -0,0 +1,62 @@
+import itertools
+from collections import OrderedDict, deque
+
+# Messages kept per room for clients that (re)connect
+HISTORY_SIZE = 50
+# Rooms with history, least recently active ones are forgotten first
+MAX_ROOMS = 500
+ALL = "*"
+
+
+class RoomHistory:
+    __slots__ = ("messages", "state")
+
+    def __init__(self, size: int):
+        self.messages = deque(maxlen=size)
+        # (seq, url) for the last !chan, (seq, None) after !stop
+        self.state = None
+
+
+class RelayHistory:
+    """Recent relayed messages and the current stream per room, for replay on connect.
+
+    Each RelayMessage is stored once as a (seq, message) pair shared by every room
+    it was sent to. Both the number of rooms and the number of messages per room
+    are capped, so memory stays bounded however long the bot runs.
+    """
+
+    def __init__(self, size: int = HISTORY_SIZE, max_rooms: int = MAX_ROOMS):
+        self.size = size
+        self.max_rooms = max_rooms
+        self._rooms = OrderedDict()
+        self._seq = itertools.count()
+
+    def _room(self, room: str) -> RoomHistory:
+        history = self._rooms.get(room)
+        if history is None:
+            history = self._rooms[room] = RoomHistory(self.size)
+            if len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+        else:
+            self._rooms.move_to_end(room)
+        return history
+
+    def record(self, message, rooms: tuple):
+        entry = (next(self._seq), message)
+        for room in (ALL, *rooms):
+            self._room(room).messages.append(entry)
+
+    def set_stream(self, url, rooms: tuple):
+        """Remembers the stream playing in ``rooms``; None means it was stopped."""
+        state = (next(self._seq), url)
+        for room in (ALL, *rooms):
+            self._room(room).state = state
+
+    def snapshot(self, rooms: set = None) -> tuple:
+        """(messages, stream url) for ``rooms``, or for everything if there are none."""
+        histories = [self._rooms[r] for r in (rooms or (ALL,)) if r in self._rooms]
+        # A message sent to both a guild and its channel is the same tuple in both rooms
+        entries = sorted({entry for h in histories for entry in h.messages}, key=lambda e: e[0])[-self.size:]
+        states = [h.state for h in histories if h.state is not None]
+        state = max(states, key=lambda s: s[0]) if states else None
+        return [message for _, message in entries], (state[1] if state else None)
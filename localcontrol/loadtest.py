@@ -0,0 +1,309 @@
+"""Load test for the StreamRelay Socket.IO relay.
+
+Starts the cog's web server locally, connects N python-socketio clients and feeds
+``on_message`` synthetic Discord messages (with a mix of !chan/!add commands) at a
+fixed rate, then prints one JSON report so runs on different revisions can be compared.
+
+    python -m localcontrol.loadtest --clients 200 --rate 100 --duration 20 --output load.json
+
+Needs aiohttp, python-socketio (with its client extras) and Red installed. The
+clients run in the same process as the server, so CPU and memory cover both.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+import socketio
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from benchtools import LoopMonitor, revision
+
+from .streamrelay import StreamRelay
+
+MARKER = "load"
+
+
+class FakeAsset:
+    def __init__(self, url: str):
+        self.url = url
+
+
+class FakeRole:
+    def __init__(self, role_id: int):
+        self.id = role_id
+
+
+class FakeAuthor:
+    bot = False
+
+    def __init__(self, author_id: int, role_id: int):
+        self.id = author_id
+        self.display_name = f"viewer{author_id}"
+        self.display_avatar = FakeAsset(f"https://cdn.discordapp.com/avatars/{author_id}/{author_id:x}.png?size=4096")
+        self.roles = [FakeRole(role_id)]
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+
+
+class FakeMessage:
+    replies = 0
+
+    def __init__(self, author: FakeAuthor, guild_id: int, content: str):
+        self.author = author
+        self.guild = FakeGuild(guild_id)
+        # One text channel per guild is enough for room fanout
+        self.channel = FakeChannel(guild_id * 10)
+        self.content = content
+
+    async def reply(self, content=None, **kwargs):
+        FakeMessage.replies += 1
+
+
+class FakeBot:
+    def __init__(self, loop):
+        self.loop = loop
+
+    async def wait_until_red_ready(self):
+        pass
+
+
+class Receiver:
+    """One simulated overlay. Records the delivery latency of every load message it gets."""
+
+    def __init__(self, url: str, proto: int, encoding: str, guild: int = None):
+        self.url = url
+        self.proto = proto
+        self.encoding = encoding
+        self.guild = guild
+        self.latencies = []
+        self.controls = 0
+        self.snapshots = 0
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.sio.on("newMessage", lambda data: self._legacy([data]))
+        self.sio.on("newMessages", self._legacy)
+        self.sio.on("msgs", self._compact)
+        self.sio.on("snapshot", self._snapshot)
+        self.sio.on("switchChannel", self._control)
+        self.sio.on("stopChannel", self._control)
+
+    async def connect(self):
+        query = "batch=1"
+        if self.proto == 2:
+            query += f"&proto=2&encoding={self.encoding}"
+        if self.guild is not None:
+            query += f"&guild={self.guild}"
+        await self.sio.connect(f"{self.url}?{query}", transports=["websocket"])
+
+    async def disconnect(self):
+        await self.sio.disconnect()
+
+    def _record(self, content: str, now: float):
+        parts = content.split(" ", 2)
+        if len(parts) >= 2 and parts[0] == MARKER:
+            self.latencies.append(now - float(parts[1]))
+
+    async def _legacy(self, messages):
+        now = time.perf_counter()
+        for message in messages:
+            self._record(message["content"], now)
+
+    async def _compact(self, data):
+        now = time.perf_counter()
+        if isinstance(data, bytes):
+            data = msgpack.unpackb(data, strict_map_key=False)
+        for _, content, _ in data["m"]:
+            self._record(content, now)
+
+    async def _snapshot(self, data):
+        self.snapshots += 1
+
+    async def _control(self, *args):
+        self.controls += 1
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    return {
+        "p50_ms": pct(50) * 1000,
+        "p90_ms": pct(90) * 1000,
+        "p99_ms": pct(99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+    }
+
+
+def make_message(seq: int, args, role_id: int) -> FakeMessage:
+    author = FakeAuthor(random.randrange(args.authors) + 1, role_id)
+    guild = random.randrange(args.guilds) + 1
+    roll = random.random()
+    if roll < args.chan_ratio:
+        content = f"!chan stream{random.randrange(20)}"
+    elif roll < args.chan_ratio + args.add_ratio:
+        content = f"!add https://example.com/{seq}.m3u8 stream{random.randrange(20)}"
+    else:
+        content = f"{MARKER} {time.perf_counter():.6f} " + "x" * args.size
+    return FakeMessage(author, guild, content)
+
+
+async def drive(cog: StreamRelay, args, role_id: int) -> int:
+    """Calls on_message at ``args.rate`` per second for ``args.duration`` seconds."""
+    sent = 0
+    start = time.perf_counter()
+    while True:
+        elapsed = time.perf_counter() - start
+        if elapsed >= args.duration:
+            return sent
+        due = int(elapsed * args.rate)
+        while sent < due:
+            await cog.on_message(make_message(sent, args, role_id))
+            sent += 1
+        await asyncio.sleep(0.005)
+
+
+async def main(args):
+    workdir = tempfile.mkdtemp(prefix="streamrelay-load-")
+    try:
+        return await _run(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def _run(args, workdir: str):
+    loop = asyncio.get_running_loop()
+    # Keep !add away from the real channels.json
+    cog = StreamRelay(FakeBot(loop), channels_file=os.path.join(workdir, "channels.json"))
+    cog.port = _free_port()
+    url = f"http://127.0.0.1:{cog.port}"
+
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", cog.port)
+            writer.close()
+            break
+        except OSError:
+            await asyncio.sleep(0.05)
+
+    receivers = [
+        Receiver(url, args.proto, args.encoding, (i % args.guilds) + 1 if args.subscribe else None)
+        for i in range(args.clients)
+    ]
+    connect_start = time.perf_counter()
+    for i in range(0, len(receivers), 50):
+        await asyncio.gather(*(r.connect() for r in receivers[i:i + 50]))
+    connect_s = time.perf_counter() - connect_start
+
+    monitor = LoopMonitor()
+    monitor_task = asyncio.create_task(monitor.run())
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    sent = await drive(cog, args, cog.role_id)
+    drive_s = time.perf_counter() - wall_start
+
+    # Wait for the fanout to drain
+    delivered = -1
+    while delivered != sum(len(r.latencies) for r in receivers):
+        delivered = sum(len(r.latencies) for r in receivers)
+        await asyncio.sleep(0.5)
+    wall_s = time.perf_counter() - wall_start
+    cpu_s = time.process_time() - cpu_start
+    monitor_task.cancel()
+
+    relay = cog.relay
+    latencies = [latency for r in receivers for latency in r.latencies]
+    report = {
+        "revision": revision(),
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "connect_s": connect_s,
+        "messages_sent": sent,
+        "send_rate_achieved": sent / drive_s,
+        "deliveries": delivered,
+        "deliveries_per_s": delivered / wall_s,
+        "latency": _percentiles(latencies),
+        "emit_latency_p95_s": relay.emit_latency.quantile(0.95),
+        "dropped": {"queue_full": relay.queue_dropped, "slow_client": relay.dropped - relay.queue_dropped},
+        "batches": relay.batches_sent,
+        "control_events_received": sum(r.controls for r in receivers),
+        "snapshots_received": sum(r.snapshots for r in receivers),
+        "replies": FakeMessage.replies,
+        "cpu_s": cpu_s,
+        "cpu_utilisation": cpu_s / wall_s,
+        "loop_blocked_s": monitor.blocked,
+        "loop_max_lag_s": monitor.max_lag,
+        "rss_bytes": _rss_bytes(),
+        "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+    await asyncio.gather(*(r.disconnect() for r in receivers), return_exceptions=True)
+    await cog.cog_unload()
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100, help="simulated overlays")
+    parser.add_argument("--rate", type=float, default=50, help="Discord messages per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to send for")
+    parser.add_argument("--guilds", type=int, default=1, help="guilds the messages are spread over")
+    parser.add_argument("--subscribe", action="store_true", help="subscribe each client to one guild")
+    parser.add_argument("--authors", type=int, default=50, help="distinct message authors")
+    parser.add_argument("--size", type=int, default=40, help="padding added to each chat message")
+    parser.add_argument("--chan-ratio", type=float, default=0.02, help="share of messages that are !chan")
+    parser.add_argument("--add-ratio", type=float, default=0.005, help="share of messages that are !add")
+    parser.add_argument("--proto", type=int, choices=(1, 2), default=1, help="relay protocol the clients ask for")
+    parser.add_argument("--encoding", choices=("json", "msgpack"), default="json", help="encoding for --proto 2")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
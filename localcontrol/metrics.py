@@ -0,0 +1,136 @@
+import bisect
+import time
+from collections import deque
+
+# Seconds, upper bounds of the emit latency histogram buckets
+EMIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# How far back the messages/s rate in /healthz looks
+RATE_WINDOW = 60
+
+
+class Histogram:
+    """Fixed-bucket histogram; observing is a bisect and two additions."""
+
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: tuple = EMIT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float):
+        """Upper bound of the bucket holding the ``q`` quantile, None if nothing was observed.
+
+        Past the last bucket this is the largest bound, so the result always stays JSON-safe.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.bounds[-1]
+
+    def prometheus(self, name: str) -> list:
+        lines = [f"# TYPE {name} histogram"]
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            lines.append(f'{name}_bucket{{le="{bound}"}} {seen}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum {self.total}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+
+class RateMeter:
+    """Turns a running total into a per-second rate over the last RATE_WINDOW seconds.
+
+    Only sampled when someone asks for the rate, never on the hot path.
+    """
+
+    def __init__(self, window: float = RATE_WINDOW):
+        self.window = window
+        self._samples = deque()
+
+    def rate(self, total: int) -> float:
+        now = time.monotonic()
+        self._samples.append((now, total))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.window:
+            self._samples.popleft()
+        first_time, first_total = self._samples[0]
+        if now - first_time <= 0:
+            return 0.0
+        return (total - first_total) / (now - first_time)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def render_prometheus(relay, channels, started: float) -> str:
+    """Prometheus text exposition of the relay pipeline and channel registry counters."""
+    clients = relay.clients.values()
+    lines = [
+        "# TYPE streamrelay_uptime_seconds gauge",
+        f"streamrelay_uptime_seconds {time.monotonic() - started:.3f}",
+        "# TYPE streamrelay_clients gauge",
+        f"streamrelay_clients {len(relay.clients)}",
+        "# TYPE streamrelay_room_clients gauge",
+        f'streamrelay_room_clients{{room="*"}} {len(relay.unfiltered)}',
+    ]
+    lines += [f'streamrelay_room_clients{{room="{_escape(room)}"}} {len(members)}' for room, members in relay.rooms.items()]
+    lines += [
+        "# TYPE streamrelay_messages_relayed_total counter",
+        f"streamrelay_messages_relayed_total {relay.published}",
+        "# TYPE streamrelay_batches_total counter",
+        f"streamrelay_batches_total {relay.batches_sent}",
+        "# TYPE streamrelay_queue_depth gauge",
+        f"streamrelay_queue_depth {relay.queue_depth}",
+        "# TYPE streamrelay_client_buffered gauge",
+        f"streamrelay_client_buffered {sum(len(c.items) for c in clients)}",
+        "# TYPE streamrelay_dropped_total counter",
+        f'streamrelay_dropped_total{{reason="queue_full"}} {relay.queue_dropped}',
+        f'streamrelay_dropped_total{{reason="slow_client"}} {relay.dropped - relay.queue_dropped}',
+        "# TYPE streamrelay_channels gauge",
+        f"streamrelay_channels {len(channels.channels)}",
+        "# TYPE streamrelay_channels_reloads_total counter",
+        f"streamrelay_channels_reloads_total {channels.reloads}",
+        "# TYPE streamrelay_channels_writes_total counter",
+        f"streamrelay_channels_writes_total {channels.writes}",
+    ]
+    lines += relay.emit_latency.prometheus("streamrelay_emit_seconds")
+    return "\n".join(lines) + "\n"
+
+
+def health(relay, channels, started: float, rate: RateMeter) -> dict:
+    """Summary for /healthz."""
+    latency = relay.emit_latency
+    return {
+        "status": "ok" if relay.running else "stopped",
+        "uptime": round(time.monotonic() - started, 1),
+        "clients": len(relay.clients),
+        "rooms": {room: len(members) for room, members in relay.rooms.items()},
+        "unfiltered_clients": len(relay.unfiltered),
+        "messages_relayed": relay.published,
+        "messages_per_second": round(rate.rate(relay.published), 2),
+        "queue_depth": relay.queue_depth,
+        "dropped": {"queue_full": relay.queue_dropped, "slow_client": relay.dropped - relay.queue_dropped},
+        "emit_latency": {
+            "p50": latency.quantile(0.5),
+            "p95": latency.quantile(0.95),
+            "p99": latency.quantile(0.99),
+            "count": latency.count,
+        },
+        "channels": len(channels.channels),
+        "channels_reloads": channels.reloads,
+        "channels_writes": channels.writes,
+    }
@@ -0,0 +1,293 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+
+from .metrics import Histogram
+from .wire import COMPACT, ClientProtocol
+
+# Outbound pipeline tuning
+FLUSH_INTERVAL = 0.05  # seconds to wait for more messages before sending a batch
+BATCH_SIZE = 50  # send right away once this many messages are waiting
+QUEUE_SIZE = 1000  # messages waiting to be batched before the oldest are dropped
+CLIENT_BUFFER = 200  # chat lines buffered per client before its oldest are dropped
+# A client whose websocket already has this many packets queued is treated as slow
+SLOW_CLIENT_PACKETS = 20
+
+CHAT = "chat"
+CONTROL = "control"
+SNAPSHOT = "snapshot"
+
+
+class ClientBuffer:
+    """Pending events for one web client. Chat lines can be dropped, control events never are."""
+
+    def __init__(self, sid: str, batched: bool = False, maxlen: int = CLIENT_BUFFER, protocol: ClientProtocol = None):
+        self.sid = sid
+        self.batched = batched
+        self.protocol = protocol or ClientProtocol()
+        self.maxlen = maxlen
+        self.rooms = set()
+        self.items = deque()
+        self.chat_count = 0
+        self.dropped = 0
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    def push_chat(self, message):
+        self.items.append((CHAT, message))
+        self.chat_count += 1
+        if self.chat_count > self.maxlen:
+            self._drop_oldest_chat()
+        self.wakeup.set()
+
+    def push_control(self, event: str, data=None):
+        self.items.append((CONTROL, (event, data)))
+        self.wakeup.set()
+
+    def _drop_oldest_chat(self):
+        for i, (kind, _) in enumerate(self.items):
+            if kind == CHAT:
+                del self.items[i]
+                self.chat_count -= 1
+                self.dropped += 1
+                return
+
+    def take(self) -> list:
+        items = list(self.items)
+        self.items.clear()
+        self.chat_count = 0
+        self.wakeup.clear()
+        return items
+
+
+def guild_room(guild_id) -> str:
+    return f"guild:{guild_id}"
+
+
+def channel_room(channel_id) -> str:
+    return f"channel:{channel_id}"
+
+
+def parse_rooms(guilds=(), channels=()) -> set:
+    """Room names for the given guild and channel IDs, ignoring anything that isn't an ID."""
+    rooms = set()
+    for ids, room in ((guilds, guild_room), (channels, channel_room)):
+        if isinstance(ids, (str, int)):
+            ids = [ids]
+        for part in ids or ():
+            for i in str(part).split(","):
+                i = i.strip()
+                if i.isdigit():
+                    rooms.add(room(i))
+    return rooms
+
+
+class RelayPipeline:
+    """Batches relayed chat messages and fans them out to per-client buffers.
+
+    ``publish`` and ``control`` never block the caller. A flusher task collects chat
+    messages for up to FLUSH_INTERVAL (or BATCH_SIZE messages) and hands each batch
+    to the buffers of the clients subscribed to its rooms; each client has its own
+    sender task so one slow overlay can't hold up the rest.
+
+    Every event is tagged with the rooms it belongs to (``guild:<id>`` and
+    ``channel:<id>``). Clients that never subscribed get everything, like before.
+    """
+
+    def __init__(self, sio, flush_interval: float = FLUSH_INTERVAL, batch_size: int = BATCH_SIZE,
+                 queue_size: int = QUEUE_SIZE, client_buffer: int = CLIENT_BUFFER):
+        self.sio = sio
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.client_buffer = client_buffer
+        self.clients = {}
+        # room -> clients subscribed to it, and the clients that take every room
+        self.rooms = defaultdict(set)
+        self.unfiltered = set()
+        self.queue_dropped = 0
+        self.client_dropped = 0
+        self.batches_sent = 0
+        self.published = 0
+        self.emit_latency = Histogram()
+        self._pending = deque()
+        self._pending_chat = 0
+        self._wakeup = asyncio.Event()
+        self._flusher = None
+
+    def start(self):
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        tasks = [self._flusher] + [c.task for c in self.clients.values()]
+        for task in tasks:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(t for t in tasks if t is not None), return_exceptions=True)
+        self.clients.clear()
+
+    # --- clients ---
+    def add_client(self, sid: str, batched: bool = False, rooms: set = None,
+                   protocol: ClientProtocol = None) -> ClientBuffer:
+        client = ClientBuffer(sid, batched, self.client_buffer, protocol)
+        client.task = asyncio.create_task(self._send_loop(client))
+        self.clients[sid] = client
+        self.subscribe(sid, rooms)
+        return client
+
+    def remove_client(self, sid: str):
+        client = self.clients.pop(sid, None)
+        if client is not None:
+            self._leave_rooms(client)
+            self.client_dropped += client.dropped
+            client.task.cancel()
+
+    def subscribe(self, sid: str, rooms: set = None):
+        """Replaces the client's rooms; no rooms means it receives every event."""
+        client = self.clients.get(sid)
+        if client is None:
+            return
+        self._leave_rooms(client)
+        client.rooms = set(rooms or ())
+        for room in client.rooms:
+            self.rooms[room].add(client)
+        if not client.rooms:
+            self.unfiltered.add(client)
+
+    def send(self, sid: str, event: str, data=None):
+        """Queues an event for one client, behind whatever is already buffered for it."""
+        client = self.clients.get(sid)
+        if client is not None:
+            client.push_control(event, data)
+
+    def send_snapshot(self, sid: str, messages: list, channel):
+        """Queues a replay of ``messages``, encoded for the client's protocol when it's sent."""
+        client = self.clients.get(sid)
+        if client is not None:
+            client.items.append((SNAPSHOT, (messages, channel)))
+            client.wakeup.set()
+
+    def _leave_rooms(self, client: ClientBuffer):
+        self.unfiltered.discard(client)
+        for room in client.rooms:
+            members = self.rooms.get(room)
+            if members is not None:
+                members.discard(client)
+                if not members:
+                    del self.rooms[room]
+
+    @property
+    def dropped(self) -> int:
+        return self.queue_dropped + self.client_dropped + sum(c.dropped for c in self.clients.values())
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None and not self._flusher.done()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    # --- producers ---
+    def publish(self, message, rooms: tuple = ()):
+        """Queues a chat message for the next batch, dropping the oldest one if the queue is full."""
+        self._pending.append((CHAT, message, rooms))
+        self._pending_chat += 1
+        self.published += 1
+        if self._pending_chat > self.queue_size:
+            for i, item in enumerate(self._pending):
+                if item[0] == CHAT:
+                    del self._pending[i]
+                    self._pending_chat -= 1
+                    self.queue_dropped += 1
+                    break
+        self._wakeup.set()
+
+    def control(self, event: str, data=None, rooms: tuple = ()):
+        """Queues a control event; it's sent in order with the chat and never dropped."""
+        self._pending.append((CONTROL, (event, data), rooms))
+        self._wakeup.set()
+
+    # --- consumers ---
+    async def _flush_loop(self):
+        while True:
+            await self._wakeup.wait()
+            if self._pending_chat < self.batch_size:
+                # Give the batch a moment to fill up
+                await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            items = list(self._pending)
+            self._pending.clear()
+            self._pending_chat = 0
+            self._fanout(items)
+
+    def _targets(self, rooms: tuple) -> set:
+        targets = set(self.unfiltered)
+        for room in rooms:
+            targets.update(self.rooms.get(room, ()))
+        return targets
+
+    def _fanout(self, items: list):
+        """Hands each event to the clients in its rooms, keeping the order per client."""
+        if not items:
+            return
+        self.batches_sent += 1
+        targets = {}
+        for kind, payload, rooms in items:
+            clients = targets.get(rooms)
+            if clients is None:
+                clients = targets[rooms] = self._targets(rooms)
+            if kind == CHAT:
+                for client in clients:
+                    client.push_chat(payload)
+            else:
+                for client in clients:
+                    client.push_control(*payload)
+
+    def _socket_backlog(self, sid: str) -> int:
+        """Packets queued on the client's engine.io socket, 0 if that can't be told."""
+        try:
+            eio_sid = self.sio.manager.eio_sid_from_sid(sid, "/")
+            return self.sio.eio.sockets[eio_sid].queue.qsize()
+        except Exception:
+            return 0
+
+    async def _send_loop(self, client: ClientBuffer):
+        while True:
+            await client.wakeup.wait()
+            # Let a slow client's buffer fill up (and drop old chat) instead of piling up on its socket
+            while self._socket_backlog(client.sid) > SLOW_CLIENT_PACKETS:
+                await asyncio.sleep(self.flush_interval)
+
+            chat = []
+            for kind, payload in client.take():
+                if kind == CHAT:
+                    chat.append(payload)
+                    continue
+                await self._send_chat(client, chat)
+                chat = []
+                if kind == SNAPSHOT:
+                    await self._emit(client, "snapshot", client.protocol.snapshot(*payload))
+                    continue
+                await self._emit(client, *payload)
+            await self._send_chat(client, chat)
+
+    async def _emit(self, client: ClientBuffer, event: str, data=None):
+        start = time.perf_counter()
+        if data is None:
+            await self.sio.emit(event, to=client.sid)
+        else:
+            await self.sio.emit(event, data, to=client.sid)
+        self.emit_latency.observe(time.perf_counter() - start)
+
+    async def _send_chat(self, client: ClientBuffer, chat: list):
+        if not chat:
+            return
+        if client.protocol.version == COMPACT:
+            await self._emit(client, *client.protocol.messages(chat))
+        elif client.batched:
+            await self._emit(client, "newMessages", [m.legacy() for m in chat])
+        else:
+            # Older overlays only understand one message per event
+            for message in chat:
+                await self._emit(client, "newMessage", message.legacy())
@@ -1,22 +1,40 @@
 import discord
-import json
 import os
+import time
+from urllib.parse import parse_qs
 from redbot.core import commands, checks
 from aiohttp import web
 import socketio
 
+from .channels import ChannelRegistry
+from .history import RelayHistory
+from .metrics import RateMeter, health, render_prometheus
+from .relay import RelayPipeline, channel_room, guild_room, parse_rooms
+from .wire import COMPACT, AuthorTable, ClientProtocol, RelayMessage
+
 class StreamRelay(commands.Cog):
     """Relay Discord messages to web client and control streams."""
 
-    def __init__(self, bot):
+    def __init__(self, bot, channels_file: str = None):
         self.bot = bot
         self.role_id = 1437970660520361984
-        self.channels_file = os.path.join(os.path.dirname(__file__), "channels.json")
+        self.port = 8080
+        self.channels_file = channels_file or os.path.join(os.path.dirname(__file__), "channels.json")
+        # Read once here, after that only in the background when the file changes
+        self.channels = ChannelRegistry(self.channels_file)
+        self.channels.load()
 
         # Socket.IO setup
         self.sio = socketio.AsyncServer(async_mode="aiohttp", cors_allowed_origins="*")
         self.app = web.Application()
         self.sio.attach(self.app)
+        self.relay = RelayPipeline(self.sio)
+        self.history = RelayHistory()
+        self.authors = AuthorTable()
+        self.started = time.monotonic()
+        self.rate = RateMeter()
+        self.app.router.add_get("/metrics", self._metrics)
+        self.app.router.add_get("/healthz", self._healthz)
 
         # Set up web server
         self.runner = web.AppRunner(self.app)
@@ -25,40 +43,71 @@ class StreamRelay(commands.Cog):
         # Register Socket.IO events
         @self.sio.event
         async def connect(sid, environ):
+            query = parse_qs(environ.get("QUERY_STRING", ""))
+            # Clients that connect with ?batch=1 get newMessages arrays instead of one event per message
+            batched = query.get("batch", ["0"])[0] in ("1", "true")
+            # ?guild=<id>,<id>&channel=<id> limits the client to those guilds/channels
+            rooms = parse_rooms(query.get("guild", []), query.get("channel", []))
+            # ?proto=2 opts into the compact protocol, clients that don't ask keep the old format
+            protocol = ClientProtocol.from_query(query)
+            self.relay.add_client(sid, batched, rooms, protocol)
+            if protocol.version == COMPACT:
+                self.relay.send(sid, "protocol", protocol.describe())
+            # Recent chat and the current stream, so a refreshed overlay doesn't start empty
+            self.relay.send_snapshot(sid, *self.history.snapshot(rooms))
             print(f"Web client connected: {sid}")
 
+        @self.sio.event
+        async def subscribe(sid, data):
+            """{"guilds": [...], "channels": [...]}, replaces the client's current subscription."""
+            if not isinstance(data, dict):
+                return {"error": "expected {guilds, channels}"}
+            rooms = parse_rooms(data.get("guilds", ()), data.get("channels", ()))
+            self.relay.subscribe(sid, rooms)
+            self.relay.send_snapshot(sid, *self.history.snapshot(rooms))
+            return {"rooms": sorted(rooms)}
+
         @self.sio.event
         async def disconnect(sid):
+            self.relay.remove_client(sid)
             print(f"Web client disconnected: {sid}")
 
-        # Make sure channels file exists
-        if not os.path.exists(self.channels_file):
-            with open(self.channels_file, "w") as f:
-                json.dump({}, f)
-
     async def _run_server(self):
+        self.relay.start()
+        self.channels.start()
         await self.bot.wait_until_red_ready()
         await self.runner.setup()
-        site = web.TCPSite(self.runner, "0.0.0.0", 8080)
+        site = web.TCPSite(self.runner, "0.0.0.0", self.port)
         await site.start()
-        print("[StreamRelay] WebSocket server started on port 8080 and ready for connections.")
-
-
-    def _load_channels(self):
-        with open(self.channels_file, "r") as f:
-            return json.load(f)
-
-    def _save_channels(self, data):
-        with open(self.channels_file, "w") as f:
-            json.dump(data, f, indent=2)
-
-    async def _emit_message(self, author, content, avatar=None, system=False):
-        await self.sio.emit("newMessage", {
-            "author": author,
-            "content": content,
-            "avatar": avatar or "https://cdn.discordapp.com/avatars/1437966889186754692/8dcb2153f7f60e0c5c30559b708c3ea6.png?size=4096",
-            "system": system
-        })
+        print(f"[StreamRelay] WebSocket server started on port {self.port} and ready for connections.")
+
+    async def _metrics(self, request):
+        text = render_prometheus(self.relay, self.channels, self.started)
+        return web.Response(text=text, content_type="text/plain")
+
+    async def _healthz(self, request):
+        data = health(self.relay, self.channels, self.started, self.rate)
+        return web.json_response(data, status=200 if self.relay.running else 503)
+
+    async def cog_unload(self):
+        await self.relay.close()
+        await self.channels.close()
+        await self.runner.cleanup()
+
+    @staticmethod
+    def _rooms(message) -> tuple:
+        """The Socket.IO rooms a Discord message belongs to."""
+        if message.guild is None:
+            return (channel_room(message.channel.id),)
+        return (guild_room(message.guild.id), channel_room(message.channel.id))
+
+    def _emit_message(self, author, content, avatar=None, system=False, rooms=(), author_id=None):
+        avatar = avatar or "https://cdn.discordapp.com/avatars/1437966889186754692/8dcb2153f7f60e0c5c30559b708c3ea6.png?size=4096"
+        interned = self.authors.intern(author_id or author, author, avatar)
+        payload = RelayMessage(interned, author, content, avatar, system)
+        self.history.record(payload, rooms)
+        # Queued, the relay pipeline batches and sends it without holding up the listener
+        self.relay.publish(payload, rooms)
 
     # --- Message relay ---
     @commands.Cog.listener()
@@ -66,63 +115,88 @@ class StreamRelay(commands.Cog):
         if message.author.bot:
             return
 
-        await self._emit_message(
+        rooms = self._rooms(message)
+        self._emit_message(
             author=message.author.display_name,
             content=message.content,
             avatar=str(message.author.display_avatar.url),
-            system=False
+            system=False,
+            rooms=rooms,
+            author_id=message.author.id
         )
 
         if not message.content.startswith("!"):
             return
 
-        channels = self._load_channels()
         content = message.content.strip()
 
         # --- !chan ---
         if content.startswith("!chan "):
             arg = content.split(" ", 1)[1]
-            url = channels.get(arg, arg)
-            await self._emit_message(
+            url = self.channels.get(arg, arg)
+            self._emit_message(
                 message.author.display_name,
                 f"is switching the channel to {url}",
                 str(message.author.display_avatar.url),
-                system=True
+                system=True,
+                rooms=rooms,
+                author_id=message.author.id
             )
-            await self.sio.emit("switchChannel", url)
+            self.history.set_stream(url, rooms)
+            self.relay.control("switchChannel", url, rooms)
 
         # --- !stop ---
         if content == "!stop" and any(r.id == self.role_id for r in message.author.roles):
-            await self._emit_message(
+            self._emit_message(
                 message.author.display_name,
                 "stopped the stream.",
                 str(message.author.display_avatar.url),
-                system=True
+                system=True,
+                rooms=rooms,
+                author_id=message.author.id
             )
-            await self.sio.emit("stopChannel")
+            self.history.set_stream(None, rooms)
+            self.relay.control("stopChannel", rooms=rooms)
 
         # --- !add ---
         if content.startswith("!add ") and any(r.id == self.role_id for r in message.author.roles):
             parts = content.split(" ")
             if len(parts) >= 3:
                 url, name = parts[1], parts[2]
-                channels[name] = url
-                self._save_channels(channels)
+                self.channels.set(name, url)
                 await message.reply(f"Added channel **{name}**.")
-                await self._emit_message(
+                self._emit_message(
                     message.author.display_name,
                     f"added a new channel: {name}",
                     str(message.author.display_avatar.url),
-                    system=True
+                    system=True,
+                    rooms=rooms,
+                    author_id=message.author.id
                 )
 
         # --- !guide ---
         if content == "!guide":
-            names = list(channels.keys())
+            names = self.channels.names()
             if names:
                 await message.reply("Available channels:\n" + "\n".join(names))
             else:
                 await message.reply("No channels available.")
 
+    @commands.command()
+    @commands.is_owner()
+    async def relaystats(self, ctx):
+        """Show connected web clients and how many relayed messages were dropped."""
+        relay = self.relay
+        slow = sorted(relay.clients.values(), key=lambda c: c.dropped, reverse=True)[:5]
+        lines = [
+            f"Web clients: {len(relay.clients)} ({len(relay.unfiltered)} unfiltered, {len(relay.rooms)} rooms)",
+            f"Queued: {relay.queue_depth}",
+            f"Batches sent: {relay.batches_sent}",
+            f"Dropped (queue full): {relay.queue_dropped}",
+            f"Dropped (slow clients): {relay.dropped - relay.queue_dropped}",
+        ]
+        lines += [f"  {c.sid}: {c.dropped} dropped, {c.chat_count} buffered" for c in slow if c.dropped]
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
 async def setup(bot):
     await bot.add_cog(StreamRelay(bot))
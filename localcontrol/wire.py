@@ -0,0 +1,149 @@
+import itertools
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Protocol 1 sends every message as a full {author, content, avatar, system} dict.
+# Protocol 2 sends each author once and then refers to them by a small number.
+LEGACY = 1
+COMPACT = 2
+# Avatars are shown tiny in the overlay, no need for the 4096px original
+AVATAR_SIZE = 128
+MAX_AUTHORS = 10000
+
+
+def resize_avatar(url: str, size: int = AVATAR_SIZE) -> str:
+    """Sets the size= query parameter of a Discord CDN image URL."""
+    parts = urlsplit(url)
+    if not parts.netloc.endswith(("discordapp.com", "discord.com", "discordapp.net")):
+        return url
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k != "size"] + [("size", str(size))]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class Author:
+    __slots__ = ("index", "name", "avatar", "version")
+
+    def __init__(self, index: int, name: str, avatar: str):
+        self.index = index
+        self.name = name
+        self.avatar = avatar
+        self.version = 0
+
+
+class AuthorTable:
+    """Interns authors to small integers for the compact protocol.
+
+    An author whose name or avatar changes keeps its number and gets a new version,
+    so clients are sent the new details once. Only the most recent MAX_AUTHORS are
+    kept; a returning author that was forgotten just gets a new number.
+    """
+
+    def __init__(self, max_authors: int = MAX_AUTHORS):
+        self.max_authors = max_authors
+        self._authors = OrderedDict()
+        self._next = itertools.count(1)
+
+    def intern(self, key, name: str, avatar: str) -> Author:
+        author = self._authors.get(key)
+        if author is None:
+            author = self._authors[key] = Author(next(self._next), name, resize_avatar(avatar))
+            if len(self._authors) > self.max_authors:
+                self._authors.popitem(last=False)
+            return author
+        self._authors.move_to_end(key)
+        if author.name != name:
+            author.name = name
+            author.version += 1
+        avatar = resize_avatar(avatar)
+        if author.avatar != avatar:
+            author.avatar = avatar
+            author.version += 1
+        return author
+
+
+class RelayMessage:
+    """One relayed chat line, rendered lazily (and only once) for each protocol."""
+
+    __slots__ = ("author", "name", "content", "avatar", "system", "_legacy", "_row")
+
+    def __init__(self, author: Author, name: str, content: str, avatar: str, system: bool):
+        self.author = author
+        self.name = name
+        self.content = content
+        self.avatar = avatar
+        self.system = system
+        self._legacy = None
+        self._row = None
+
+    def legacy(self) -> dict:
+        if self._legacy is None:
+            self._legacy = {
+                "author": self.name,
+                "content": self.content,
+                "avatar": self.avatar,
+                "system": self.system,
+            }
+        return self._legacy
+
+    def row(self) -> list:
+        if self._row is None:
+            self._row = [self.author.index, self.content, int(self.system)]
+        return self._row
+
+
+class ClientProtocol:
+    """What one client negotiated, and which authors it has already been sent."""
+
+    __slots__ = ("version", "packed", "known")
+
+    def __init__(self, version: int = LEGACY, packed: bool = False):
+        self.version = version
+        self.packed = packed and msgpack is not None
+        self.known = {}
+
+    @classmethod
+    def from_query(cls, query: dict):
+        """?proto=2 asks for the compact protocol, &encoding=msgpack for binary frames."""
+        try:
+            version = int(query.get("proto", [LEGACY])[0])
+        except ValueError:
+            version = LEGACY
+        if version != COMPACT:
+            return cls()
+        return cls(COMPACT, query.get("encoding", ["json"])[0] == "msgpack")
+
+    def describe(self) -> dict:
+        return {"version": self.version, "encoding": "msgpack" if self.packed else "json"}
+
+    def _new_authors(self, messages: list) -> dict:
+        authors = {}
+        if len(self.known) > MAX_AUTHORS:
+            self.known.clear()
+        for message in messages:
+            author = message.author
+            if self.known.get(author.index) != author.version:
+                self.known[author.index] = author.version
+                authors[author.index] = [author.name, author.avatar]
+        return authors
+
+    def _encode(self, payload: dict):
+        return msgpack.packb(payload) if self.packed else payload
+
+    def messages(self, messages: list):
+        """(event, data) for a batch of compact messages, with any authors the client lacks."""
+        payload = {"m": [m.row() for m in messages]}
+        authors = self._new_authors(messages)
+        if authors:
+            payload["a"] = authors
+        return "msgs", self._encode(payload)
+
+    def snapshot(self, messages: list, channel) -> dict:
+        if self.version == LEGACY:
+            return {"messages": [m.legacy() for m in messages], "channel": channel}
+        payload = {"m": [m.row() for m in messages], "a": self._new_authors(messages), "channel": channel}
+        return self._encode(payload)
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+
+log = logging.getLogger("red.screenshot")
+
+# format name: (ffmpeg encoder, file extension)
+IMAGE_FORMATS = {
+    "png": ("png", "png"),
+    "jpeg": ("mjpeg", "jpg"),
+    "webp": ("libwebp", "webp"),
+}
+DEFAULT_FORMAT = "jpeg"
+DEFAULT_MAX_WIDTH = 1920
+DEFAULT_QUALITY = 85
+CAPTURE_TIMEOUT = 25
+
+
+def scale_filter(max_width: int = None) -> list:
+    """-vf args that shrink frames wider than ``max_width``, keeping the aspect ratio."""
+    if not max_width:
+        return []
+    return ["-vf", f"scale='min(iw,{max_width})':-2"]
+
+
+def encode_args(fmt: str, quality: int = DEFAULT_QUALITY) -> list:
+    """ffmpeg output args for one image in ``fmt`` at ``quality`` (1-100)."""
+    encoder, _ = IMAGE_FORMATS[fmt]
+    args = ["-c:v", encoder]
+    if fmt == "jpeg":
+        # mjpeg's qscale runs from 2 (best) to 31 (worst)
+        args += ["-q:v", str(round(31 - quality / 100 * 29))]
+    elif fmt == "webp":
+        args += ["-quality", str(quality)]
+    return args + ["-f", "image2pipe", "pipe:1"]
+
+
+async def _run_ffmpeg(args: list, stdin_data: bytes = None, timeout: float = CAPTURE_TIMEOUT):
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-loglevel", "error", *args,
+        stdin=asyncio.subprocess.PIPE if stdin_data is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(stdin_data), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        log.warning("ffmpeg timed out while capturing frame.")
+        return None
+    if proc.returncode != 0 or not stdout:
+        log.warning("ffmpeg could not capture a frame: %s", stderr.decode(errors="replace").strip())
+        return None
+    return stdout
+
+
+async def grab_frame(url: str, fmt: str = DEFAULT_FORMAT, max_width: int = None, quality: int = DEFAULT_QUALITY):
+    """Decodes the first keyframe of ``url`` and returns it encoded as ``fmt``, or None.
+
+    Everything happens through ffmpeg's stdout, nothing is written to disk.
+    Raises FileNotFoundError if ffmpeg isn't installed.
+    """
+    return await _run_ffmpeg(
+        ["-skip_frame", "nokey", "-i", url, "-an", "-frames:v", "1", *scale_filter(max_width), *encode_args(fmt, quality)]
+    )
+
+
+async def encode_frame(image: bytes, fmt: str = DEFAULT_FORMAT, max_width: int = None, quality: int = DEFAULT_QUALITY):
+    """Re-encodes (and optionally shrinks) an in-memory image, e.g. a warm worker's PNG."""
+    return await _run_ffmpeg(
+        ["-f", "image2pipe", "-i", "pipe:0", "-frames:v", "1", *scale_filter(max_width), *encode_args(fmt, quality)],
+        stdin_data=image,
+    )
+
+
+async def decode_segment(segment: bytes, fmt: str = DEFAULT_FORMAT, max_width: int = None, quality: int = DEFAULT_QUALITY):
+    """Decodes the first keyframe of an in-memory media segment (TS or fMP4)."""
+    return await _run_ffmpeg(
+        ["-skip_frame", "nokey", "-i", "pipe:0", "-an", "-frames:v", "1", *scale_filter(max_width), *encode_args(fmt, quality)],
+        stdin_data=segment,
+    )
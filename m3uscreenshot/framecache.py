@@ -0,0 +1,77 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+
+# Frames younger than this are served from memory, can be changed with [p]scrnset ttl
+FRAME_TTL = 3.0
+LATENCY_SAMPLES = 100
+
+
+class StreamStats:
+    __slots__ = ("hits", "misses", "coalesced", "failures", "latencies")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def percentile(self, pct: float):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class FrameCache:
+    """Short-lived cache of captured frames that also merges concurrent captures.
+
+    While a capture for a key is running, everyone else asking for that key waits on
+    it instead of starting their own; once it finishes the frame is reused for ``ttl``
+    seconds.
+    """
+
+    def __init__(self, ttl: float = FRAME_TTL):
+        self.ttl = ttl
+        self.stats = defaultdict(StreamStats)
+        self._frames = {}
+        self._inflight = {}
+
+    async def get(self, key, stream: str, factory):
+        """Returns the cached result for ``key``, or awaits ``factory()`` to capture it."""
+        stats = self.stats[stream]
+        entry = self._frames.get(key)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            stats.hits += 1
+            return entry[1]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            stats.coalesced += 1
+        else:
+            stats.misses += 1
+            task = asyncio.ensure_future(self._capture(key, stats, factory))
+            self._inflight[key] = task
+        # Shield so one impatient caller timing out doesn't cancel everyone's capture
+        return await asyncio.shield(task)
+
+    async def _capture(self, key, stats: StreamStats, factory):
+        start = time.monotonic()
+        try:
+            result = await factory()
+        finally:
+            del self._inflight[key]
+        now = time.monotonic()
+        stats.latencies.append(now - start)
+        if result is None:
+            stats.failures += 1
+            return None
+        self._prune(now)
+        self._frames[key] = (now, result)
+        return result
+
+    def _prune(self, now: float):
+        for key, (taken, _) in list(self._frames.items()):
+            if now - taken >= self.ttl:
+                del self._frames[key]
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import re
+import time
+from urllib.parse import urljoin
+
+import aiohttp
+
+log = logging.getLogger("red.screenshot")
+
+# Master playlists rarely change, media playlists are cached for their target duration
+MASTER_TTL = 5 * 60
+# Most streams each cache keeps, expired ones are dropped first
+MAX_CACHED = 256
+TIMEOUT = aiohttp.ClientTimeout(total=15)
+
+ATTRIBUTE_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+class HlsError(Exception):
+    """The stream can't be handled by the direct HLS path."""
+
+
+def parse_attributes(text: str) -> dict:
+    return {k: v.strip('"') for k, v in ATTRIBUTE_RE.findall(text)}
+
+
+class Variant:
+    __slots__ = ("url", "bandwidth", "width", "height")
+
+    def __init__(self, url: str, attrs: dict):
+        self.url = url
+        self.bandwidth = int(attrs.get("BANDWIDTH", 0) or 0)
+        self.width, self.height = 0, 0
+        if "x" in attrs.get("RESOLUTION", ""):
+            w, h = attrs["RESOLUTION"].split("x", 1)
+            self.width, self.height = int(w), int(h)
+
+
+class MediaPlaylist:
+    __slots__ = ("segments", "init_url", "target_duration", "encrypted")
+
+    def __init__(self):
+        self.segments = []
+        self.init_url = None
+        self.target_duration = 6
+        self.encrypted = False
+
+
+def parse_playlist(text: str, base_url: str):
+    """Parses an M3U8 into a list of Variants (master playlist) or a MediaPlaylist."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or lines[0] != "#EXTM3U":
+        raise HlsError("not an M3U8 playlist")
+
+    if any(line.startswith("#EXT-X-STREAM-INF") for line in lines):
+        variants = []
+        for i, line in enumerate(lines):
+            if line.startswith("#EXT-X-STREAM-INF:") and i + 1 < len(lines) and not lines[i + 1].startswith("#"):
+                variants.append(Variant(urljoin(base_url, lines[i + 1]), parse_attributes(line.split(":", 1)[1])))
+        return variants
+
+    playlist = MediaPlaylist()
+    for line in lines:
+        if line.startswith("#EXT-X-TARGETDURATION:"):
+            playlist.target_duration = float(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-MAP:"):
+            uri = parse_attributes(line.split(":", 1)[1]).get("URI")
+            if uri:
+                playlist.init_url = urljoin(base_url, uri)
+        elif line.startswith("#EXT-X-KEY:"):
+            if parse_attributes(line.split(":", 1)[1]).get("METHOD", "NONE") != "NONE":
+                playlist.encrypted = True
+        elif not line.startswith("#"):
+            playlist.segments.append(urljoin(base_url, line))
+    return playlist
+
+
+def pick_variant(variants: list, max_width: int = None) -> Variant:
+    """Highest quality variant no wider than ``max_width`` (or the smallest if none is)."""
+    fitting = [v for v in variants if not max_width or not v.width or v.width <= max_width]
+    if fitting:
+        return max(fitting, key=lambda v: (v.width, v.bandwidth))
+    return min(variants, key=lambda v: (v.width, v.bandwidth))
+
+
+class HlsClient:
+    """Fetches just the newest segment of an HLS stream over one pooled session."""
+
+    def __init__(self):
+        self._session = None
+        # stream url -> (expires, media playlist url) and media playlist url -> (expires, MediaPlaylist)
+        self._variants = {}
+        self._playlists = {}
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=8, ttl_dns_cache=300),
+                timeout=TIMEOUT,
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    @staticmethod
+    def _store(cache: dict, key: str, expires: float, value, now: float):
+        """Caches ``value`` until ``expires``, evicting stale and then oldest entries."""
+        for stale in [k for k, (until, _) in cache.items() if until <= now]:
+            del cache[stale]
+        cache.pop(key, None)
+        while len(cache) >= MAX_CACHED:
+            del cache[next(iter(cache))]
+        cache[key] = (expires, value)
+
+    async def _get(self, url: str) -> bytes:
+        async with self.session.get(url) as resp:
+            if resp.status != 200:
+                raise HlsError(f"HTTP {resp.status} for {url}")
+            return await resp.read()
+
+    async def media_playlist(self, url: str, max_width: int = None) -> MediaPlaylist:
+        now = time.monotonic()
+        cached = self._variants.get(url)
+        media_url = cached[1] if cached and cached[0] > now else None
+
+        if media_url is None:
+            parsed = parse_playlist((await self._get(url)).decode(errors="replace"), url)
+            if isinstance(parsed, MediaPlaylist):
+                # Not a master playlist, the URL is the media playlist itself
+                self._store(self._variants, url, now + MASTER_TTL, url, now)
+                self._store(self._playlists, url, now + parsed.target_duration, parsed, now)
+                return parsed
+            if not parsed:
+                raise HlsError("master playlist has no variants")
+            media_url = pick_variant(parsed, max_width).url
+            self._store(self._variants, url, now + MASTER_TTL, media_url, now)
+
+        cached = self._playlists.get(media_url)
+        if cached and cached[0] > now:
+            return cached[1]
+        playlist = parse_playlist((await self._get(media_url)).decode(errors="replace"), media_url)
+        if not isinstance(playlist, MediaPlaylist):
+            raise HlsError("variant playlist is a master playlist")
+        self._store(self._playlists, media_url, now + playlist.target_duration, playlist, now)
+        return playlist
+
+    async def latest_segment(self, url: str, max_width: int = None) -> bytes:
+        """Returns the newest media segment (with its init section, for fMP4 streams)."""
+        playlist = await self.media_playlist(url, max_width)
+        if playlist.encrypted:
+            raise HlsError("encrypted stream")
+        if not playlist.segments:
+            raise HlsError("media playlist has no segments")
+        parts = []
+        if playlist.init_url:
+            parts.append(await self._get(playlist.init_url))
+        parts.append(await self._get(playlist.segments[-1]))
+        return b"".join(parts)
+
+    async def fetch_segment(self, url: str, max_width: int = None):
+        """Like ``latest_segment`` but returns None instead of raising on failure."""
+        try:
+            return await self.latest_segment(url, max_width)
+        except (HlsError, aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            log.info("Direct HLS fetch failed for %s: %s", url, e)
+            return None
@@ -1,25 +1,55 @@
 import asyncio
-import json
+import io
 import logging
-import os
+import re
 from pathlib import Path
 
 import discord
 from redbot.core import commands
 
+from .capture import CAPTURE_TIMEOUT, DEFAULT_FORMAT, DEFAULT_MAX_WIDTH, DEFAULT_QUALITY, IMAGE_FORMATS, decode_segment, encode_frame, grab_frame
+from .framecache import FrameCache
+from .hls import HlsClient
+from .sheet import TILE_WIDTH, build_contact_sheet
+from .streamindex import StreamIndex
+from .warm import WarmPool
+
 log = logging.getLogger("red.screenshot")
 
+# How many captures may run at once for [p]scrn all / a,b,c, and how many fit on one sheet
+CAPTURE_LIMIT = 4
+MAX_SHEET = 16
+
 
 class Screenshot(commands.Cog):
-    """Take a screenshot from M3U8 livestreams using VLC."""
+    """Take a screenshot from M3U8 livestreams using ffmpeg (or VLC)."""
 
     def __init__(self, bot):
         self.bot = bot
-        self.streams = {}
-        self.streams_file = Path(__file__).parent / "streams.json"
+        # streams.json plus any .m3u playlists next to it
+        self.index = StreamIndex(Path(__file__).parent)
+        # Streams marked "warm" in streams.json get a long-lived capture worker
+        self.warm = WarmPool()
+        self.hls = HlsClient()
+        self.frames = FrameCache()
+        # Output settings, see [p]scrnset
+        self.image_format = DEFAULT_FORMAT
+        self.max_width = DEFAULT_MAX_WIDTH
+        self.quality = DEFAULT_QUALITY
+        self.capture_limit = CAPTURE_LIMIT
+        self._capture_slots = asyncio.Semaphore(CAPTURE_LIMIT)
         self.save_dir = Path("/Users/konata/Pictures")
         self._ensure_save_dir()
-        self._load_streams()
+        self.index.load()
+
+    async def cog_load(self):
+        self.warm.start()
+        for name in sorted(self.index.warm):
+            self.warm.get(name, self.index.streams[name])
+
+    async def cog_unload(self):
+        await self.warm.close()
+        await self.hls.close()
 
     def _ensure_save_dir(self):
         try:
@@ -27,25 +57,6 @@ class Screenshot(commands.Cog):
         except Exception as e:
             log.error("Could not create save directory %s: %s", self.save_dir, e)
 
-    def _load_streams(self):
-        """Load streams from streams.json."""
-        if not self.streams_file.exists():
-            log.warning("streams.json not found at %s", self.streams_file)
-            self.streams = {}
-            return
-
-        try:
-            with self.streams_file.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-            if isinstance(data, dict):
-                self.streams = {str(k): str(v) for k, v in data.items()}
-            else:
-                log.error("streams.json must be a simple object of {name: url}.")
-                self.streams = {}
-        except Exception as e:
-            log.error("Failed to load streams.json: %s", e)
-            self.streams = {}
-
     async def _run_vlc_capture(self, url: str, prefix: str) -> Path | None:
         """
         Run VLC to capture a single frame to self.save_dir with given prefix.
@@ -108,58 +119,304 @@ class Screenshot(commands.Cog):
             log.exception("Error running VLC: %s", e)
             return None
 
+    async def capture(self, name: str, url: str, fmt: str = None, max_width: int = None):
+        """
+        Capture one frame from a stream, entirely in memory.
+        Returns (image bytes, file extension), or None on failure.
+        Raises FileNotFoundError if neither ffmpeg nor VLC is installed.
+        """
+        fmt = fmt or self.image_format
+        max_width = max_width if max_width is not None else self.max_width
+        ext = IMAGE_FORMATS[fmt][1]
+
+        if name in self.index.warm:
+            worker = self.warm.get(name, url)
+            frame = await worker.get_frame() if worker else None
+            if frame:
+                if fmt == "png" and not max_width:
+                    return frame, "png"
+                encoded = await encode_frame(frame, fmt, max_width, self.quality)
+                if encoded:
+                    return encoded, ext
+            # Pool full or no frame yet, fall back to a one-off capture
+
+        if ".m3u8" in url.lower():
+            # Only download the newest segment instead of letting a player buffer the stream
+            segment = await self.hls.fetch_segment(url, max_width)
+            if segment:
+                try:
+                    data = await decode_segment(segment, fmt, max_width, self.quality)
+                except FileNotFoundError:
+                    data = None
+                if data:
+                    return data, ext
+
+        try:
+            data = await grab_frame(url, fmt, max_width, self.quality)
+            return (data, ext) if data else None
+        except FileNotFoundError:
+            log.warning("ffmpeg executable not found in PATH, falling back to VLC.")
+
+        img_path = await self._run_vlc_capture(url, "scrn_{}_".format(re.sub(r"[^\w-]+", "_", name)))
+        if img_path is None or not img_path.exists():
+            return None
+        try:
+            return img_path.read_bytes(), img_path.suffix.lstrip(".")
+        finally:
+            # Delete file after reading it
+            try:
+                img_path.unlink()
+            except Exception as e:
+                log.warning("Could not delete screenshot file %s: %s", img_path, e)
+
+    async def cached_capture(self, name: str, url: str, fmt: str = None, max_width: int = None):
+        """``capture`` behind the frame cache: recent frames are reused and concurrent requests share one capture."""
+        fmt = fmt or self.image_format
+        max_width = max_width if max_width is not None else self.max_width
+        key = (url, fmt, max_width, self.quality)
+        return await self.frames.get(key, name, lambda: self.capture(name, url, fmt, max_width))
+
+    async def _capture_tile(self, name: str, url: str):
+        async with self._capture_slots:
+            try:
+                result = await asyncio.wait_for(
+                    self.cached_capture(name, url, fmt="jpeg", max_width=TILE_WIDTH), timeout=CAPTURE_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                return name, None, "timed out"
+            except FileNotFoundError:
+                return name, None, "no ffmpeg/vlc"
+        if result is None:
+            return name, None, "failed"
+        return name, result[0], None
+
+    async def _scrn_many(self, ctx: commands.Context, entries: list, unknown: list = ()):
+        if not entries:
+            await ctx.send(f"None of those streams are configured: `{', '.join(unknown)}`")
+            return
+        if len(entries) > MAX_SHEET:
+            await ctx.send(f"That's {len(entries)} streams, only the first {MAX_SHEET} will be captured.")
+            entries = entries[:MAX_SHEET]
+
+        await ctx.typing()
+        # Captures run side by side, so this takes about as long as the slowest stream
+        results = await asyncio.gather(*(self._capture_tile(e.name, e.url) for e in entries))
+        frames = [(name, data) for name, data, _ in results if data]
+        problems = [f"`{name}`: {error}" for name, _, error in results if error]
+        problems += [f"`{name}`: unknown stream" for name in unknown]
+
+        if not frames:
+            await ctx.send("I couldn't capture any of those streams.\n" + "\n".join(problems))
+            return
+
+        fmt = self.image_format
+        try:
+            sheet = await asyncio.get_running_loop().run_in_executor(
+                None, build_contact_sheet, frames, fmt, self.quality
+            )
+        except Exception as e:
+            log.exception("Could not build contact sheet: %s", e)
+            await ctx.send("I couldn't put the screenshots together.")
+            return
+
+        text = f"Screenshots from {len(frames)}/{len(entries) + len(unknown)} streams:"
+        if problems:
+            text += "\n" + "\n".join(problems)
+        file = discord.File(io.BytesIO(sheet), filename=f"scrn_sheet.{IMAGE_FORMATS[fmt][1]}")
+        await ctx.send(text, file=file)
+
+    def _not_found(self, name: str) -> str:
+        text = f"I couldn't find a stream named `{name}`."
+        suggestions = self.index.fuzzy(name, limit=5)
+        if suggestions:
+            text += "\nDid you mean: " + ", ".join(f"`{e.name}`" for e in suggestions)
+        return text
+
     @commands.command(name="scrn")
-    async def scrn(self, ctx: commands.Context, nameofstream: str):
+    async def scrn(self, ctx: commands.Context, *, nameofstream: str):
         """
-        Take a screenshot from a configured M3U8 stream using VLC.
+        Take a screenshot from a configured M3U8 stream.
+
+        Names can be shortened to any unique prefix. Use `all`, `group:<group>` or a
+        comma separated list of names to get one contact sheet of several streams.
 
         Usage:
           [p]scrn <nameofstream>
+          [p]scrn all
+          [p]scrn group:<group>
+          [p]scrn <name>,<name>,...
         """
         name = nameofstream.strip()
+        await self.index.refresh()
 
-        if not self.streams:
-            await ctx.send("No streams configured. Make sure `streams.json` exists and is valid.")
+        if not len(self.index):
+            await ctx.send("No streams configured. Make sure `streams.json` or an `.m3u` playlist exists and is valid.")
             return
 
-        url = self.streams.get(name)
-        if not url:
-            # Try reloading in case file was edited
-            self._load_streams()
-            url = self.streams.get(name)
+        if name.lower() == "all":
+            await self._scrn_many(ctx, self.index.entries)
+            return
+        if name.lower().startswith("group:"):
+            group = name.split(":", 1)[1].strip()
+            entries = self.index.group(group)
+            if not entries:
+                await ctx.send(f"There's no group named `{group}`.")
+                return
+            await self._scrn_many(ctx, entries)
+            return
+        if "," in name:
+            entries, unknown = [], []
+            for part in dict.fromkeys(n.strip() for n in name.split(",") if n.strip()):
+                entry = self.index.resolve(part)
+                if entry:
+                    entries.append(entry)
+                else:
+                    unknown.append(part)
+            await self._scrn_many(ctx, entries, unknown)
+            return
 
-        if not url:
-            available = ", ".join(sorted(self.streams.keys())) or "None"
-            await ctx.send(
-                f"I couldn't find a stream named `{name}` in `streams.json`.\n"
-                f"Available names: `{available}`"
-            )
+        entry = self.index.resolve(name)
+        if entry is None:
+            await ctx.send(self._not_found(name))
             return
+        name, url = entry.name, entry.url
 
         await ctx.typing()
-        await ctx.send(f"Capturing screenshot from `{name}` via VLC…")
-
-        prefix = f"scrn_{name}_"
 
         try:
-            img_path = await self._run_vlc_capture(url, prefix)
+            result = await self.cached_capture(name, url)
         except FileNotFoundError:
             await ctx.send(
-                "I couldn't run `vlc`. Make sure VLC is installed and `vlc` is available in your system PATH."
+                "I couldn't run `ffmpeg` or `vlc`. Make sure one of them is installed and available in your system PATH."
             )
             return
 
-        if img_path is None or not img_path.exists():
+        if result is None:
             await ctx.send("I couldn't capture a screenshot from that stream.")
             return
 
-        # Send the screenshot
-        try:
-            file = discord.File(str(img_path), filename=img_path.name)
-            await ctx.send(f"Screenshot from `{name}`:", file=file)
-        finally:
-            # Delete file after sending
-            try:
-                img_path.unlink()
-            except Exception as e:
-                log.warning("Could not delete screenshot file %s: %s", img_path, e)
+        data, ext = result
+        # Playlist names can contain anything, keep the filename tame
+        safe_name = re.sub(r"[^\w-]+", "_", name)
+        file = discord.File(io.BytesIO(data), filename=f"scrn_{safe_name}.{ext}")
+        await ctx.send(f"Screenshot from `{name}`:", file=file)
+
+    @commands.command(name="scrnfind")
+    async def scrnfind(self, ctx: commands.Context, *, query: str = ""):
+        """
+        Search the configured streams by name.
+
+        Add `group:<group>` to only search one group, or search for nothing to list the groups.
+        """
+        await self.index.refresh()
+        group = None
+        words = []
+        for word in query.split():
+            if word.lower().startswith("group:"):
+                group = word.split(":", 1)[1]
+            else:
+                words.append(word)
+        text = " ".join(words)
+
+        if not text and not group:
+            groups = self.index.groups
+            await ctx.send(
+                f"{len(self.index)} streams in {len(groups)} groups."
+                + (f"\nGroups: {', '.join(f'`{g}`' for g in groups[:50])}" if groups else "")
+            )
+            return
+
+        if not text:
+            found = self.index.group(group)[:25]
+        else:
+            found = [e for e in self.index.prefix(text) if not group or (e.group or "").lower() == group.lower()]
+            if not found:
+                found = self.index.fuzzy(text, limit=10, group=group)
+        if not found:
+            await ctx.send("No matching streams.")
+            return
+        lines = [f"`{e.name}`" + (f" ({e.group})" if e.group else "") for e in found[:25]]
+        await ctx.send("\n".join(lines))
+
+    @commands.command(name="scrnstats")
+    @commands.is_owner()
+    async def scrnstats(self, ctx: commands.Context):
+        """Show per-stream screenshot cache hits/misses and capture latency."""
+        if not self.frames.stats:
+            await ctx.send("No screenshots taken yet.")
+            return
+
+        lines = [f"Frame cache TTL: {self.frames.ttl:g}s"]
+        for name, stats in sorted(self.frames.stats.items()):
+            line = f"{name}: {stats.hits} hits, {stats.misses} misses, {stats.coalesced} shared"
+            if stats.failures:
+                line += f", {stats.failures} failed"
+            p50, p95 = stats.percentile(50), stats.percentile(95)
+            if p50 is not None:
+                line += f", capture p50 {p50:.2f}s / p95 {p95:.2f}s"
+            lines.append(line)
+        text = "\n".join(lines)
+        if len(text) > 1900:
+            text = text[:1900] + "\n…"
+        await ctx.send(text)
+
+    @commands.command(name="scrnwarm")
+    @commands.is_owner()
+    async def scrnwarm(self, ctx: commands.Context):
+        """Show the warm capture workers and how fresh their frames are."""
+        if not self.warm.workers:
+            await ctx.send(f"No warm captures running (limit {self.warm.limit}).")
+            return
+
+        lines = []
+        for name, worker in sorted(self.warm.workers.items()):
+            age = worker.frame_age
+            frame = f"frame {age:.1f}s old" if age is not None else "no frame yet"
+            lines.append(f"{name}: {frame}, restarts: {worker.restarts}")
+        await ctx.send(f"Warm captures ({len(self.warm.workers)}/{self.warm.limit}):\n" + "\n".join(lines))
+
+    @commands.group(name="scrnset")
+    @commands.is_owner()
+    async def scrnset(self, ctx: commands.Context):
+        """Screenshot output settings."""
+
+    @scrnset.command(name="format")
+    async def scrnset_format(self, ctx: commands.Context, fmt: str):
+        """Set the image format: png, jpeg or webp."""
+        fmt = fmt.lower().replace("jpg", "jpeg")
+        if fmt not in IMAGE_FORMATS:
+            await ctx.send(f"Format must be one of: {', '.join(IMAGE_FORMATS)}")
+            return
+        self.image_format = fmt
+        await ctx.send(f"Screenshots will be sent as {fmt.upper()}.")
+
+    @scrnset.command(name="width")
+    async def scrnset_width(self, ctx: commands.Context, max_width: int):
+        """Shrink screenshots wider than this many pixels (0 to keep full size)."""
+        self.max_width = max(max_width, 0)
+        await ctx.send(f"Max width: {self.max_width or 'unlimited'}.")
+
+    @scrnset.command(name="ttl")
+    async def scrnset_ttl(self, ctx: commands.Context, seconds: float):
+        """Reuse a stream's last screenshot for this many seconds (0 to always capture)."""
+        self.frames.ttl = max(seconds, 0)
+        await ctx.send(f"Screenshots are reused for {self.frames.ttl:g}s.")
+
+    @scrnset.command(name="parallel")
+    async def scrnset_parallel(self, ctx: commands.Context, limit: int):
+        """Set how many streams `[p]scrn all` captures at once."""
+        if limit < 1:
+            await ctx.send("The limit must be at least 1.")
+            return
+        self.capture_limit = limit
+        self._capture_slots = asyncio.Semaphore(limit)
+        await ctx.send(f"Up to {limit} captures will run at once.")
+
+    @scrnset.command(name="quality")
+    async def scrnset_quality(self, ctx: commands.Context, quality: int):
+        """Set JPEG/WebP quality, 1-100."""
+        if not 1 <= quality <= 100:
+            await ctx.send("Quality must be between 1 and 100.")
+            return
+        self.quality = quality
+        await ctx.send(f"Quality: {quality}.")
@@ -0,0 +1,42 @@
+import io
+import math
+
+from PIL import Image, ImageDraw, ImageFont
+
+TILE_WIDTH = 640
+LABEL_HEIGHT = 28
+BACKGROUND = (24, 24, 24)
+LABEL_COLOR = (235, 235, 235)
+
+# Pillow format names for the cog's image formats
+PIL_FORMATS = {"png": "PNG", "jpeg": "JPEG", "webp": "WEBP"}
+
+
+def build_contact_sheet(frames: list, fmt: str = "jpeg", quality: int = 85, columns: int = None) -> bytes:
+    """Tiles ``[(label, image bytes), ...]`` into one labelled grid image encoded as ``fmt``.
+
+    Blocking, run it in an executor.
+    """
+    tiles = []
+    for label, data in frames:
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+        height = round(image.height * TILE_WIDTH / image.width)
+        tiles.append((label, image.resize((TILE_WIDTH, height))))
+
+    columns = columns or math.ceil(math.sqrt(len(tiles)))
+    rows = math.ceil(len(tiles) / columns)
+    tile_height = max(image.height for _, image in tiles) + LABEL_HEIGHT
+    sheet = Image.new("RGB", (columns * TILE_WIDTH, rows * tile_height), BACKGROUND)
+    draw = ImageDraw.Draw(sheet)
+    font = ImageFont.load_default()
+
+    for i, (label, image) in enumerate(tiles):
+        x = (i % columns) * TILE_WIDTH
+        y = (i // columns) * tile_height
+        sheet.paste(image, (x, y))
+        draw.text((x + 8, y + image.height + 7), label, fill=LABEL_COLOR, font=font)
+
+    out = io.BytesIO()
+    options = {"quality": quality} if fmt in ("jpeg", "webp") else {}
+    sheet.save(out, PIL_FORMATS[fmt], **options)
+    return out.getvalue()
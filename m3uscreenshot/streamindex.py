@@ -0,0 +1,227 @@
+import asyncio
+import bisect
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+
+log = logging.getLogger("red.screenshot")
+
+# Source files are stat()ed at most this often
+RELOAD_CHECK_INTERVAL = 2
+
+EXTINF_ATTR_RE = re.compile(r'([\w-]+)="([^"]*)"')
+
+
+class StreamEntry:
+    __slots__ = ("name", "url", "tvg_id", "group", "warm")
+
+    def __init__(self, name: str, url: str, tvg_id: str = None, group: str = None, warm: bool = False):
+        self.name = name
+        self.url = url
+        self.tvg_id = tvg_id
+        self.group = group
+        self.warm = warm
+
+
+def _trigrams(text: str) -> set:
+    text = f"  {text.lower()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def parse_m3u(text: str) -> list:
+    """Parses an extended M3U playlist into StreamEntries (tvg-id, group-title and name)."""
+    entries = []
+    info = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#EXTINF:"):
+            info = line
+        elif not line.startswith("#"):
+            name, attrs = line, {}
+            if info:
+                attrs = dict(EXTINF_ATTR_RE.findall(info))
+                # The display name follows the first comma that isn't inside an attribute
+                rest = EXTINF_ATTR_RE.sub("", info).split(",", 1)
+                name = (rest[1].strip() if len(rest) > 1 else "") or attrs.get("tvg-name") or line
+            entries.append(StreamEntry(name, line, attrs.get("tvg-id") or None, attrs.get("group-title") or None))
+            info = None
+    return entries
+
+
+def parse_streams_json(text: str) -> list:
+    """Parses streams.json: {name: url} or {name: {"url": ..., "warm": true, "group": ...}}."""
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("streams.json must be an object of {name: url} or {name: {url, warm}}.")
+    entries = []
+    for k, v in data.items():
+        if isinstance(v, dict):
+            if "url" not in v:
+                log.error("Stream %s in streams.json has no url.", k)
+                continue
+            entries.append(StreamEntry(str(k), str(v["url"]), v.get("tvg-id"), v.get("group"), bool(v.get("warm"))))
+        else:
+            entries.append(StreamEntry(str(k), str(v)))
+    return entries
+
+
+class StreamIndex:
+    """In-memory index of all configured streams, rebuilt when a source file's mtime changes.
+
+    Sources are streams.json plus any .m3u/.m3u8 playlists in the same folder. Exact
+    lookups are a dict hit, prefix search is a bisect over sorted names and fuzzy
+    search scores candidates from a trigram index.
+    """
+
+    def __init__(self, folder: Path, json_name: str = "streams.json"):
+        self.folder = folder
+        self.json_file = folder / json_name
+        self.entries = []
+        self.streams = {}
+        self.warm = set()
+        self.reloads = 0
+        self._by_lower = {}
+        self._sorted = []
+        self._groups = {}
+        self._trigram_index = {}
+        self._trigram_counts = {}
+        self._mtimes = None
+        self._last_check = 0.0
+        self._lock = asyncio.Lock()
+
+    def sources(self) -> list:
+        files = [self.json_file] if self.json_file.exists() else []
+        files += sorted(p for p in self.folder.iterdir() if p.suffix.lower() in (".m3u", ".m3u8"))
+        return files
+
+    def _stat(self) -> dict:
+        mtimes = {}
+        for path in self.sources():
+            try:
+                mtimes[path] = path.stat().st_mtime_ns
+            except OSError:
+                pass
+        return mtimes
+
+    def _read(self, paths: list) -> list:
+        entries = []
+        for path in paths:
+            try:
+                text = path.read_text(encoding="utf-8", errors="replace")
+                if path == self.json_file:
+                    entries += parse_streams_json(text)
+                else:
+                    entries += parse_m3u(text)
+            except Exception as e:
+                log.error("Failed to load %s: %s", path.name, e)
+        return entries
+
+    def load(self):
+        """Blocking (re)load of every source file."""
+        mtimes = self._stat()
+        if not mtimes:
+            log.warning("No streams.json or .m3u playlists found in %s", self.folder)
+        self._build(self._read(list(mtimes)))
+        self._mtimes = mtimes
+
+    async def refresh(self, force: bool = False):
+        """Reloads in an executor if any source file changed since the last load."""
+        now = time.monotonic()
+        if not force and now - self._last_check < RELOAD_CHECK_INTERVAL:
+            return
+        self._last_check = now
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            mtimes = await loop.run_in_executor(None, self._stat)
+            if not force and mtimes == self._mtimes:
+                return
+            entries = await loop.run_in_executor(None, self._read, list(mtimes))
+            self._build(entries)
+            self._mtimes = mtimes
+
+    def _build(self, entries: list):
+        by_lower = {}
+        streams = {}
+        groups = defaultdict(list)
+        trigram_index = defaultdict(list)
+        trigram_counts = {}
+        kept = []
+        for entry in entries:
+            key = entry.name.lower()
+            if key in by_lower:
+                # First definition wins, streams.json is read before playlists
+                continue
+            by_lower[key] = entry
+            streams[entry.name] = entry.url
+            kept.append(entry)
+            if entry.group:
+                groups[entry.group.lower()].append(entry)
+            grams = _trigrams(entry.name)
+            trigram_counts[entry] = len(grams)
+            for gram in grams:
+                trigram_index[gram].append(entry)
+
+        self.entries = kept
+        self.streams = streams
+        self.warm = {e.name for e in kept if e.warm}
+        self._by_lower = by_lower
+        self._sorted = sorted(by_lower)
+        self._groups = dict(groups)
+        self._trigram_index = dict(trigram_index)
+        self._trigram_counts = trigram_counts
+        self.reloads += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, name: str):
+        """Exact, case-insensitive lookup."""
+        return self._by_lower.get(name.strip().lower())
+
+    def prefix(self, text: str, limit: int = 25) -> list:
+        text = text.strip().lower()
+        start = bisect.bisect_left(self._sorted, text)
+        found = []
+        for key in self._sorted[start:start + limit]:
+            if not key.startswith(text):
+                break
+            found.append(self._by_lower[key])
+        return found
+
+    def fuzzy(self, text: str, limit: int = 10, group: str = None) -> list:
+        """Closest names by trigram overlap."""
+        grams = _trigrams(text)
+        scores = defaultdict(int)
+        for gram in grams:
+            for entry in self._trigram_index.get(gram, ()):
+                scores[entry] += 1
+        if group:
+            group = group.lower()
+            scores = {e: s for e, s in scores.items() if e.group and e.group.lower() == group}
+        ranked = sorted(
+            scores.items(),
+            key=lambda kv: kv[1] / (len(grams) + self._trigram_counts[kv[0]] - kv[1]),
+            reverse=True,
+        )
+        return [entry for entry, _ in ranked[:limit]]
+
+    def group(self, name: str) -> list:
+        return self._groups.get(name.strip().lower(), [])
+
+    @property
+    def groups(self) -> list:
+        return sorted({e.group for e in self.entries if e.group})
+
+    def resolve(self, name: str):
+        """Exact match, else a unique prefix match, else None."""
+        entry = self.get(name)
+        if entry is None:
+            matches = self.prefix(name, limit=2)
+            if len(matches) == 1:
+                entry = matches[0]
+        return entry
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+
+log = logging.getLogger("red.screenshot")
+
+# Most streams kept warm at once, and how long an unused one stays up
+WARM_LIMIT = 3
+IDLE_TIMEOUT = 15 * 60
+# How long scrn waits for a freshly started worker's first frame
+FIRST_FRAME_TIMEOUT = 15
+MAX_BACKOFF = 60
+# A held frame older than this (a few keyframe intervals) is too stale to pass off as live
+MAX_FRAME_AGE = 30
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+async def read_png(stream: asyncio.StreamReader):
+    """Reads one PNG image from an image2pipe stream, or returns None at EOF."""
+    try:
+        signature = await stream.readexactly(8)
+        if signature != PNG_SIGNATURE:
+            raise ValueError("ffmpeg output is not a PNG stream")
+        parts = [signature]
+        while True:
+            header = await stream.readexactly(8)
+            length = int.from_bytes(header[:4], "big")
+            body = await stream.readexactly(length + 4)  # chunk data + CRC
+            parts += [header, body]
+            if header[4:8] == b"IEND":
+                return b"".join(parts)
+    except asyncio.IncompleteReadError:
+        return None
+
+
+class WarmWorker:
+    """Keeps one ffmpeg process decoding a stream's keyframes, holding the newest in memory."""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.frame = None
+        self.frame_time = None
+        self.started = time.monotonic()
+        self.last_used = time.monotonic()
+        self.restarts = 0
+        self._ready = asyncio.Event()
+        self._proc = None
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        backoff = 1
+        while True:
+            try:
+                self._proc = await asyncio.create_subprocess_exec(
+                    "ffmpeg", "-loglevel", "error",
+                    # Only keyframes are decoded, which keeps this cheap
+                    "-skip_frame", "nokey", "-i", self.url,
+                    "-an", "-vsync", "0", "-c:v", "png", "-f", "image2pipe", "pipe:1",
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+                while True:
+                    frame = await read_png(self._proc.stdout)
+                    if frame is None:
+                        break
+                    self.frame = frame
+                    self.frame_time = time.monotonic()
+                    self._ready.set()
+                    backoff = 1
+            except FileNotFoundError:
+                log.error("ffmpeg executable not found in PATH, warm capture for %s disabled.", self.name)
+                return
+            except ValueError as e:
+                log.error("Warm capture for %s: %s", self.name, e)
+            finally:
+                await self._kill()
+                # The stream is down, don't keep serving its last frame while we restart
+                self.frame = None
+                self.frame_time = None
+                self._ready.clear()
+
+            self.restarts += 1
+            log.warning("Warm capture for %s stopped, restarting in %ss.", self.name, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+    async def _kill(self):
+        proc, self._proc = self._proc, None
+        if proc is not None and proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+    async def get_frame(self, timeout: float = FIRST_FRAME_TIMEOUT):
+        """Returns the newest frame as PNG bytes, waiting for the first one if needed.
+
+        Returns None if no frame arrives in time or the newest one is older than
+        MAX_FRAME_AGE, so the caller falls back to a cold capture.
+        """
+        self.last_used = time.monotonic()
+        if self.frame is None:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+        age = self.frame_age
+        if age is None or age > MAX_FRAME_AGE:
+            return None
+        return self.frame
+
+    @property
+    def frame_age(self):
+        if self.frame_time is None:
+            return None
+        return time.monotonic() - self.frame_time
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._kill()
+
+
+class WarmPool:
+    """The set of running WarmWorkers, capped at ``limit`` and reaped when idle."""
+
+    def __init__(self, limit: int = WARM_LIMIT, idle_timeout: float = IDLE_TIMEOUT):
+        self.limit = limit
+        self.idle_timeout = idle_timeout
+        self.workers = {}
+        self._reaper = None
+
+    def start(self):
+        self._reaper = asyncio.create_task(self._reap())
+
+    def get(self, name: str, url: str):
+        """Returns the worker for ``name``, starting one if there's room. None if the pool is full."""
+        worker = self.workers.get(name)
+        if worker is not None and worker.url != url:
+            # streams.json changed under us
+            asyncio.create_task(worker.stop())
+            del self.workers[name]
+            worker = None
+        if worker is None:
+            if len(self.workers) >= self.limit:
+                return None
+            worker = WarmWorker(name, url)
+            worker.start()
+            self.workers[name] = worker
+        return worker
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(30)
+            now = time.monotonic()
+            for name, worker in list(self.workers.items()):
+                if now - worker.last_used > self.idle_timeout:
+                    log.info("Stopping idle warm capture for %s.", name)
+                    del self.workers[name]
+                    await worker.stop()
+
+    async def stop(self, name: str):
+        worker = self.workers.pop(name, None)
+        if worker is not None:
+            await worker.stop()
+
+    async def close(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+        for name in list(self.workers):
+            await self.stop(name)
@@ -1,27 +1,65 @@
 import discord
 from redbot.core import commands
-import aiohttp
+try:
+    # Where Red's Downloader installs the repo's shared library
+    from cog_shared.senkohttp import PrefetchPool, ResilientJson, Unavailable, acquire, release
+except ModuleNotFoundError as e:
+    if not (e.name or "").startswith("cog_shared"):
+        raise
+    # Development checkout, the library sits next to the cogs
+    from senkohttp import PrefetchPool, ResilientJson, Unavailable, acquire, release
 
 BASE_URL = "https://someapi.com"  # Replace with the actual API base URL
+# Base URLs serving the same API, tried in order when the ones before them are failing
+MIRRORS = [BASE_URL]
+# Seconds a command waits on the API before giving up, per endpoint
+BUDGETS = {"/owoify": 3.0}
 
 class ImageGif(commands.Cog):
     """A cog to fetch GIFs and images from an API."""
 
     def __init__(self, bot):
         self.bot = bot
+        self.http = acquire(bot)
+        self.api = ResilientJson(self.http, MIRRORS, budgets=BUDGETS)
+        # Random image endpoints are fetched ahead of time, see fetch_random
+        self.prefetch = PrefetchPool(self._prefetch_json)
+
+    async def cog_unload(self):
+        await self.prefetch.close()
+        await release(self.bot)
+
+    async def cog_command_error(self, ctx, error):
+        if isinstance(getattr(error, "original", None), Unavailable):
+            # The breaker is open, answer right away instead of waiting on a dead API
+            await ctx.send("Couldn't contact the API right now...")
+            return
+        await self.bot.on_command_error(ctx, error, unhandled_by_cog=True)
 
     async def fetch_json(self, endpoint):
-        """Fetch JSON response from the API."""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(BASE_URL + endpoint) as resp:
-                if resp.status == 200:
-                    return await resp.json()
-                return None
+        """Fetch JSON response from the API.
+
+        Raises Unavailable while every mirror's circuit breaker is open.
+        """
+        return await self.api.get_json(endpoint)
+
+    async def _prefetch_json(self, endpoint):
+        try:
+            return await self.api.get_json(endpoint, hedge=False)
+        except Unavailable:
+            return None
+
+    async def fetch_random(self, endpoint):
+        """Like fetch_json, but answered from the prefetch pool when a result is ready."""
+        data = self.prefetch.pop(endpoint)
+        if data is None:
+            data = await self.fetch_json(endpoint)
+        return data
 
     @commands.command()
     async def eightball(self, ctx):
         """Get a random 8ball response."""
-        data = await self.fetch_json("/8ball")
+        data = await self.fetch_random("/8ball")
         if data:
             embed = discord.Embed(description=data["text"], color=discord.Color.blue())
             embed.set_image(url=data["image"])
@@ -42,7 +80,7 @@ class ImageGif(commands.Cog):
             await ctx.send(f"Invalid category! Available categories: {', '.join(categories)}")
             return
 
-        data = await self.fetch_json(f"/img/{category.lower()}")
+        data = await self.fetch_random(f"/img/{category.lower()}")
         if data:
             await ctx.send(data["url"])
         else:
@@ -60,7 +98,7 @@ class ImageGif(commands.Cog):
     @commands.command()
     async def cat(self, ctx):
         """Get a random cat image."""
-        data = await self.fetch_json("/img/meow")
+        data = await self.fetch_random("/img/meow")
         if data:
             await ctx.send(data["url"])
         else:
@@ -102,5 +140,32 @@ class ImageGif(commands.Cog):
         else:
             await ctx.send("Couldn't fetch a name right now...")
 
+    @commands.command()
+    @commands.is_owner()
+    async def nekosapi(self, ctx):
+        """Show the API circuit breakers and per-endpoint latency."""
+        lines = []
+        for url, breaker in self.api.breakers.items():
+            line = f"{url}: {breaker.state}, {breaker.failures} failures in a row, tripped {breaker.trips}x"
+            if breaker.retry_in():
+                line += f", retrying in {breaker.retry_in():.0f}s"
+            lines.append(line)
+        lines.append(f"Prefetch: {self.prefetch.hits} hits, {self.prefetch.misses} misses, {self.prefetch.failures} failed refills")
+        for endpoint, stats in sorted(self.api.stats.items()):
+            line = f"{endpoint}: {stats.calls} calls, {stats.failures} failed, {stats.rejected} rejected"
+            if stats.hedges:
+                line += f", {stats.hedges} hedged ({stats.hedge_wins} won)"
+            ready = self.prefetch.ready(endpoint)
+            if ready:
+                line += f", {ready} prefetched"
+            p50 = stats.percentile(50)
+            if p50 is not None:
+                line += f", p50 {p50:.2f}s / p95 {stats.percentile(95):.2f}s / p99 {stats.percentile(99):.2f}s"
+            lines.append(line)
+        text = "\n".join(lines)
+        if len(text) > 1900:
+            text = text[:1900] + "\n…"
+        await ctx.send(text)
+
 async def setup(bot):
     await bot.add_cog(ImageGif(bot))
@@ -0,0 +1,44 @@
+"""Shared pooled HTTP client for the cogs in this repo.
+
+Red's Downloader installs this as a shared library under ``lib/cog_shared``, which
+makes it importable as ``cog_shared.senkohttp``. Cogs fall back to plain
+``senkohttp`` when run from a checkout of the repo:
+
+    try:
+        from cog_shared.senkohttp import acquire, release
+    except ModuleNotFoundError as e:
+        if not (e.name or "").startswith("cog_shared"):
+            raise
+        from senkohttp import acquire, release
+
+    self.http = acquire(bot)        # in __init__
+    data = await self.http.get_json(url)
+    await release(self.bot)         # in cog_unload
+
+All cogs loaded on one bot share a single aiohttp session (keep-alive, DNS cache,
+per-host connection limits and default timeouts). The session is closed when the
+last cog using it releases it.
+
+Random endpoints (images, GIFs) can be kept warm with a PrefetchPool so commands
+reply without waiting on the API, and ResilientJson adds latency budgets, hedged
+requests, mirrors and circuit breakers in front of an unreliable API.
+"""
+from .client import DEFAULT_TIMEOUT, HostStats, HttpClient, HttpError, Response, acquire, release
+from .prefetch import PrefetchPool, RateLimited, json_fetcher
+from .resilience import CircuitBreaker, ResilientJson, Unavailable
+
+__all__ = [
+    "CircuitBreaker",
+    "DEFAULT_TIMEOUT",
+    "HostStats",
+    "HttpClient",
+    "HttpError",
+    "PrefetchPool",
+    "RateLimited",
+    "ResilientJson",
+    "Response",
+    "Unavailable",
+    "acquire",
+    "json_fetcher",
+    "release",
+]
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+import aiohttp
+
+log = logging.getLogger("red.senkohttp")
+
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=5, sock_read=10)
+CONNECTION_LIMIT = 100
+PER_HOST_LIMIT = 10
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 30
+RETRIES = 2
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 4.0
+# Statuses that are worth another try; anything else is returned to the caller as-is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+LATENCY_SAMPLES = 200
+
+
+class HttpError(Exception):
+    """A request failed after all its retries (connection error, timeout or retryable status)."""
+
+
+class Response:
+    """Status, headers and the already-read body of a response."""
+
+    __slots__ = ("status", "headers", "data", "url")
+
+    def __init__(self, status: int, headers, data, url: str):
+        self.status = status
+        self.headers = headers
+        self.data = data
+        self.url = url
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+class HostStats:
+    __slots__ = ("requests", "errors", "retries", "latencies")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def percentile(self, pct: float):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _backoff(attempt: int, retry_after: str = None) -> float:
+    """Full-jitter exponential backoff, or the server's Retry-After when it gives one in seconds."""
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), BACKOFF_CAP)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class HttpClient:
+    """One pooled aiohttp session with retries and per-host stats."""
+
+    def __init__(self, timeout: aiohttp.ClientTimeout = DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self.stats = defaultdict(HostStats)
+        self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=CONNECTION_LIMIT,
+                    limit_per_host=PER_HOST_LIMIT,
+                    ttl_dns_cache=DNS_CACHE_TTL,
+                    keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ),
+                timeout=self.timeout,
+            )
+        return self._session
+
+    @property
+    def closed(self) -> bool:
+        return self._session is None or self._session.closed
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def request(self, method: str, url: str, *, read: str = "json", retries: int = RETRIES, **kwargs) -> Response:
+        """Sends a request and reads the body as ``read`` ("json", "text" or "bytes").
+
+        Connection errors, timeouts and 429/5xx responses are retried with jittered
+        backoff. Other statuses are returned without retrying. Raises HttpError when
+        every attempt failed.
+        """
+        stats = self.stats[urlsplit(url).netloc]
+        for attempt in range(retries + 1):
+            if attempt:
+                stats.retries += 1
+            stats.requests += 1
+            start = time.monotonic()
+            try:
+                async with self.session.request(method, url, **kwargs) as resp:
+                    if resp.status in RETRY_STATUSES and attempt < retries:
+                        stats.errors += 1
+                        await asyncio.sleep(_backoff(attempt, resp.headers.get("Retry-After")))
+                        continue
+                    if resp.status != 200:
+                        data = None
+                    elif read == "json":
+                        data = await resp.json(content_type=None)
+                    elif read == "text":
+                        data = await resp.text()
+                    else:
+                        data = await resp.read()
+                    stats.latencies.append(time.monotonic() - start)
+                    if resp.status >= 400:
+                        stats.errors += 1
+                    return Response(resp.status, resp.headers, data, str(resp.url))
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                stats.errors += 1
+                if attempt >= retries:
+                    raise HttpError(f"{method} {url} failed: {e!r}") from e
+                await asyncio.sleep(_backoff(attempt))
+        raise HttpError(f"{method} {url} failed after {retries + 1} attempts")
+
+    async def get_json(self, url: str, **kwargs):
+        """The decoded JSON body of a 200 response, or None on any failure."""
+        try:
+            resp = await self.request("GET", url, read="json", **kwargs)
+        except HttpError as e:
+            log.info("%s", e)
+            return None
+        return resp.data if resp.status == 200 else None
+
+    async def get_text(self, url: str, **kwargs):
+        """The text body of a 200 response, or None on any failure."""
+        try:
+            resp = await self.request("GET", url, read="text", **kwargs)
+        except HttpError as e:
+            log.info("%s", e)
+            return None
+        return resp.data if resp.status == 200 else None
+
+
+# One client per bot, shared by every cog that acquired it
+_clients = {}
+_users = defaultdict(int)
+
+
+def acquire(bot) -> HttpClient:
+    """The bot's shared client. Every acquire() needs a matching release() on unload."""
+    key = id(bot)
+    client = _clients.get(key)
+    if client is None:
+        client = _clients[key] = HttpClient()
+    _users[key] += 1
+    return client
+
+
+async def release(bot):
+    """Gives back a client from acquire(), closing the session once no cog uses it."""
+    key = id(bot)
+    _users[key] -= 1
+    if _users[key] > 0:
+        return
+    _users.pop(key, None)
+    client = _clients.pop(key, None)
+    if client is not None:
+        await client.close()
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+
+from .client import HttpError
+
+log = logging.getLogger("red.senkohttp")
+
+# Results kept ready per key
+POOL_SIZE = 5
+# Results older than this are thrown away instead of served
+RESULT_TTL = 10 * 60
+# Keys nobody asked for in this long stop being refilled
+IDLE_AFTER = 30 * 60
+# Seconds between background fetches, doubled after each failure up to MAX_BACKOFF
+REFILL_INTERVAL = 1.0
+MAX_BACKOFF = 120.0
+
+
+class RateLimited(Exception):
+    """Raised by a pool's fetch function when upstream said to slow down."""
+
+    def __init__(self, retry_after: float = None):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class PrefetchPool:
+    """Keeps a few results of random endpoints ready so commands don't wait on the API.
+
+    ``pop(key)`` returns a ready result instantly (or None, and the caller fetches live).
+    A background task tops the queue of every recently used key back up, one request
+    at a time, pacing itself and backing off when fetches fail or are rate limited.
+    """
+
+    def __init__(self, fetch, size: int = POOL_SIZE, ttl: float = RESULT_TTL,
+                 interval: float = REFILL_INTERVAL, idle_after: float = IDLE_AFTER):
+        self.fetch = fetch
+        self.size = size
+        self.ttl = ttl
+        self.interval = interval
+        self.idle_after = idle_after
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self._queues = defaultdict(deque)
+        self._last_used = {}
+        self._delay = interval
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def pop(self, key):
+        """A prefetched result for ``key``, or None if there's no fresh one ready."""
+        now = time.monotonic()
+        self._last_used[key] = now
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refill())
+        queue = self._queues[key]
+        self._expire(queue, now)
+        self._wakeup.set()
+        if queue:
+            self.hits += 1
+            return queue.popleft()[1]
+        self.misses += 1
+        return None
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def ready(self, key) -> int:
+        """Fresh results waiting for ``key``."""
+        now = time.monotonic()
+        return sum(1 for added, _ in self._queues.get(key, ()) if now - added < self.ttl)
+
+    def _expire(self, queue: deque, now: float):
+        while queue and now - queue[0][0] >= self.ttl:
+            queue.popleft()
+
+    def _next_key(self, now: float):
+        """(key most in need of a refill, seconds until something expires)."""
+        best, best_len, next_expiry = None, self.size, None
+        for key, used in list(self._last_used.items()):
+            if now - used >= self.idle_after:
+                del self._last_used[key]
+                self._queues.pop(key, None)
+                continue
+            queue = self._queues[key]
+            self._expire(queue, now)
+            if len(queue) < best_len:
+                best, best_len = key, len(queue)
+            if queue:
+                expiry = queue[0][0] + self.ttl - now
+                next_expiry = expiry if next_expiry is None else min(next_expiry, expiry)
+        return best, next_expiry
+
+    async def _refill(self):
+        while True:
+            key, next_expiry = self._next_key(time.monotonic())
+            if key is None:
+                # Everything is full, sleep until a result expires or someone pops one
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=next_expiry)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            value, retry_after = None, 0
+            try:
+                value = await self.fetch(key)
+            except RateLimited as e:
+                retry_after = e.retry_after or 0
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Prefetching %s failed", key)
+
+            if value is None:
+                self.failures += 1
+                self._delay = min(max(self._delay * 2, self.interval, retry_after), MAX_BACKOFF)
+            else:
+                self._queues[key].append((time.monotonic(), value))
+                self._delay = self.interval
+            await asyncio.sleep(self._delay)
+
+
+def json_fetcher(http, base_url: str = ""):
+    """A fetch function for PrefetchPool that GETs ``base_url + key`` once, without retries.
+
+    Retrying is left to the pool's pacing, and a 429 becomes RateLimited so it backs off.
+    """
+
+    async def fetch(key):
+        try:
+            resp = await http.request("GET", base_url + key, retries=0)
+        except HttpError:
+            return None
+        if resp.status == 429:
+            retry_after = resp.headers.get("Retry-After", "")
+            raise RateLimited(float(retry_after) if retry_after.isdigit() else None)
+        return resp.data if resp.status == 200 else None
+
+    return fetch
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+
+import aiohttp
+
+from .client import HttpError
+from .prefetch import RateLimited
+
+log = logging.getLogger("red.senkohttp")
+
+# Whole-call deadline per endpoint unless the caller gives its own budgets
+DEFAULT_BUDGET = 5.0
+# Hedge after the endpoint's p95, but never sooner than this or before there's enough history
+MIN_HEDGE_DELAY = 0.15
+DEFAULT_HEDGE_DELAY = 1.0
+MIN_SAMPLES = 20
+LATENCY_SAMPLES = 200
+# Consecutive failures that open a mirror's breaker, and how long it stays open
+FAILURE_THRESHOLD = 5
+RESET_AFTER = 30.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """Stops sending requests to an upstream after repeated failures.
+
+    Opens after FAILURE_THRESHOLD failures in a row. After RESET_AFTER seconds one
+    trial request is let through (half-open); it closes the breaker again on success
+    or re-opens it on failure.
+    """
+
+    def __init__(self, threshold: int = FAILURE_THRESHOLD, reset_after: float = RESET_AFTER):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_after:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            if self.state != OPEN:
+                self.trips += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def cancelled(self):
+        """A request let through by allow() was abandoned without a result."""
+        if self.state == HALF_OPEN:
+            self._probing = False
+
+    def retry_in(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.reset_after - (time.monotonic() - self.opened_at))
+
+
+class EndpointStats:
+    __slots__ = ("calls", "failures", "hedges", "hedge_wins", "rejected", "latencies")
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def percentile(self, pct: float):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        return max(MIN_HEDGE_DELAY, self.percentile(95))
+
+
+class Unavailable(Exception):
+    """Every mirror's breaker is open, the call wasn't attempted."""
+
+
+class ResilientJson:
+    """GETs JSON from a set of mirror base URLs with budgets, hedging and breakers.
+
+    Each call has a latency budget for its endpoint. A request that fails is retried
+    on the next healthy mirror not tried yet, until the budget runs out. If the first
+    request hasn't answered by the endpoint's p95, a second one is sent to the next
+    healthy mirror (or the same one if there's only one) and whichever answers first
+    wins. Each mirror has its own circuit breaker; when all are open calls fail
+    immediately with Unavailable instead of piling onto a dead upstream.
+    """
+
+    def __init__(self, http, base_urls: list, budgets: dict = None, default_budget: float = DEFAULT_BUDGET):
+        self.http = http
+        self.base_urls = list(base_urls)
+        self.budgets = budgets or {}
+        self.default_budget = default_budget
+        self.breakers = {url: CircuitBreaker() for url in self.base_urls}
+        self.stats = defaultdict(EndpointStats)
+
+    @staticmethod
+    def endpoint_key(endpoint: str) -> str:
+        return endpoint.split("?", 1)[0]
+
+    async def _attempt(self, base_url: str, endpoint: str, budget: float):
+        """One request. Returns (ok, data); ok is False when the mirror itself misbehaved.
+
+        Raises RateLimited on a 429, after counting it against the mirror's breaker.
+        """
+        breaker = self.breakers[base_url]
+        try:
+            resp = await self.http.request(
+                "GET", base_url + endpoint, retries=0, timeout=aiohttp.ClientTimeout(total=budget)
+            )
+        except HttpError as e:
+            log.info("%s", e)
+            breaker.failure()
+            return False, None
+        except asyncio.CancelledError:
+            # Lost to a hedge or the caller went away; a half-open trial must not stay claimed
+            breaker.cancelled()
+            raise
+        if resp.status == 429:
+            breaker.failure()
+            retry_after = resp.headers.get("Retry-After", "")
+            raise RateLimited(float(retry_after) if retry_after.isdigit() else None)
+        if resp.status >= 500:
+            breaker.failure()
+            return False, None
+        breaker.success()
+        return True, resp.data if resp.status == 200 else None
+
+    def _pick(self, exclude=()):
+        """The first mirror whose breaker lets a request through, skipping ``exclude``."""
+        for url in self.base_urls:
+            if url not in exclude and self.breakers[url].allow():
+                return url
+        return None
+
+    async def get_json(self, endpoint: str, hedge: bool = True):
+        """The JSON body for ``endpoint``, or None. Raises Unavailable while every breaker is open.
+
+        With ``hedge=False`` (background refills) a 429 is raised as RateLimited so the
+        caller can back off; otherwise it just counts as that mirror failing.
+        """
+        key = self.endpoint_key(endpoint)
+        stats = self.stats[key]
+        budget = self.budgets.get(key, self.default_budget)
+        first = self._pick()
+        if first is None:
+            stats.rejected += 1
+            raise Unavailable(key)
+
+        stats.calls += 1
+        start = time.monotonic()
+        deadline = start + budget
+        tasks = [asyncio.create_task(self._attempt(first, endpoint, budget))]
+        mirrors = {tasks[0]: first}
+        tried = {first}
+        hedged = None
+        hedge_at = start + stats.hedge_delay() if hedge else None
+        try:
+            while tasks:
+                now = time.monotonic()
+                if now >= deadline:
+                    # Out of budget, a mirror that slow counts as failing (once per call)
+                    for mirror in {mirrors[task] for task in tasks}:
+                        self.breakers[mirror].failure()
+                    break
+                timeout = deadline - now
+                if hedge_at is not None:
+                    timeout = min(timeout, max(0.0, hedge_at - now))
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    tasks.remove(task)
+                    try:
+                        ok, data = task.result()
+                    except RateLimited:
+                        if not hedge:
+                            stats.failures += 1
+                            raise
+                        ok, data = False, None
+                    if ok:
+                        stats.latencies.append(time.monotonic() - start)
+                        if task is hedged:
+                            stats.hedge_wins += 1
+                        return data
+
+                target = None
+                if not tasks:
+                    # Everything sent so far failed: fall back to a mirror not tried yet
+                    target = self._pick(exclude=tried)
+                elif hedge_at is not None and time.monotonic() >= hedge_at:
+                    # Slower than p95: race a second request, on the same mirror if there's no other
+                    hedge_at = None
+                    target = self._pick(exclude=tried) or self._pick()
+                    if target is not None:
+                        stats.hedges += 1
+                if target is not None:
+                    task = asyncio.create_task(self._attempt(target, endpoint, deadline - time.monotonic()))
+                    if tasks:
+                        hedged = task
+                    mirrors[task] = target
+                    tried.add(target)
+                    tasks.append(task)
+        finally:
+            for task in tasks:
+                task.cancel()
+        stats.failures += 1
+        return None
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+
+import pytest
+
+web = pytest.importorskip("aiohttp.web")
+pytest.importorskip("redbot")
+
+from ytdl import filebin  # noqa: E402
+from ytdl.filebin import FilebinUploader, UploadStatus  # noqa: E402
+
+
+class FakeFilebin:
+    """Local stand-in for Filebin that records every upload it receives.
+
+    ``replies`` is the status to answer each request with, in order; the last one repeats.
+    """
+
+    def __init__(self, replies=(201,)):
+        self.replies = list(replies)
+        self.uploads = []
+
+    async def handle(self, request):
+        body = b""
+        async for chunk in request.content.iter_any():
+            body += chunk
+        self.uploads.append((request.match_info["bin"], request.match_info["name"], body))
+        status = self.replies[min(len(self.uploads), len(self.replies)) - 1]
+        return web.Response(status=status, text="nope" if status != 201 else "")
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post("/{bin}/{name}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+@pytest.fixture
+def payload(tmp_path, monkeypatch):
+    monkeypatch.setattr(filebin, "CHUNK_SIZE", 1024)
+    monkeypatch.setattr(filebin, "_backoff", lambda attempt: 0)
+    path = tmp_path / "video.mp4"
+    path.write_bytes(bytes(range(256)) * 40)
+    return path
+
+
+async def _upload(server, path):
+    uploader = FilebinUploader(server.url)
+    status = UploadStatus()
+    try:
+        url = await uploader.upload(str(path), "my video.mp4", bin_name="testbin", status=status)
+    finally:
+        await uploader.close()
+    return url, status
+
+
+def test_chunked_upload(payload):
+    async def main():
+        async with FakeFilebin() as server:
+            url, status = await _upload(server, payload)
+        return server, url, status
+
+    server, url, status = asyncio.run(main())
+    assert url == f"{server.url}/testbin/my%20video.mp4"
+    assert server.uploads == [("testbin", "my video.mp4", payload.read_bytes())]
+    assert status.sent == status.total == payload.stat().st_size
+    assert status.attempt == 1
+
+
+def test_retry_restarts_upload(payload):
+    async def main():
+        async with FakeFilebin(replies=(503, 201)) as server:
+            url, status = await _upload(server, payload)
+        return server, url, status
+
+    server, url, status = asyncio.run(main())
+    assert url is not None
+    # Both attempts sent the whole file from the start
+    assert [body for _, _, body in server.uploads] == [payload.read_bytes()] * 2
+    assert status.attempt == 2
+    assert status.sent == status.total
+
+
+def test_failure_is_reported(payload, caplog):
+    async def main():
+        async with FakeFilebin(replies=(500,)) as server:
+            url, status = await _upload(server, payload)
+        return server, url, status
+
+    with caplog.at_level(logging.WARNING, logger="red.senko-cogs.ytdl"):
+        server, url, status = asyncio.run(main())
+    assert url is None
+    assert len(server.uploads) == filebin.RETRIES
+    assert status.attempt == filebin.RETRIES
+    assert "Filebin upload failed: 500, nope" in caplog.text
+
+
+def test_client_error_is_not_retried(payload, caplog):
+    async def main():
+        async with FakeFilebin(replies=(403,)) as server:
+            url, _ = await _upload(server, payload)
+        return server, url
+
+    with caplog.at_level(logging.WARNING, logger="red.senko-cogs.ytdl"):
+        server, url = asyncio.run(main())
+    assert url is None
+    assert len(server.uploads) == 1
+    assert "403" in caplog.text
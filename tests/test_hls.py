@@ -0,0 +1,153 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+web = pytest.importorskip("aiohttp.web")
+pytest.importorskip("redbot")
+
+from m3uscreenshot import hls  # noqa: E402
+from m3uscreenshot.hls import HlsClient, HlsError, MediaPlaylist, parse_playlist, pick_variant  # noqa: E402
+
+MASTER = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360
+low/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=5000000,RESOLUTION=1920x1080,CODECS="avc1.640028,mp4a.40.2"
+high/index.m3u8
+"""
+
+MEDIA = """#EXTM3U
+#EXT-X-TARGETDURATION:4
+#EXT-X-MAP:URI="init.mp4"
+#EXTINF:4.0,
+seg1.m4s
+#EXTINF:4.0,
+seg2.m4s
+"""
+
+ENCRYPTED = """#EXTM3U
+#EXT-X-TARGETDURATION:4
+#EXT-X-KEY:METHOD=AES-128,URI="key.bin"
+#EXTINF:4.0,
+seg1.ts
+"""
+
+FILES = {
+    "/master.m3u8": MASTER,
+    "/low/index.m3u8": MEDIA,
+    "/high/index.m3u8": MEDIA,
+    "/low/init.mp4": b"low-init|",
+    "/low/seg2.m4s": b"low-seg2",
+    "/high/init.mp4": b"high-init|",
+    "/high/seg2.m4s": b"high-seg2",
+    "/enc.m3u8": ENCRYPTED,
+}
+
+
+class FixtureServer:
+    """Serves FILES over HTTP and counts the requests for each path."""
+
+    def __init__(self):
+        self.hits = Counter()
+
+    async def handle(self, request):
+        self.hits[request.path] += 1
+        body = FILES.get(request.path)
+        if body is None:
+            return web.Response(status=404)
+        return web.Response(body=body.encode() if isinstance(body, str) else body)
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/{path:.*}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{self.runner.addresses[0][1]}"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+def serve(coro_fn):
+    """Runs ``coro_fn(server, client)`` against a fresh fixture server and HlsClient."""
+
+    async def main():
+        client = HlsClient()
+        try:
+            async with FixtureServer() as server:
+                return server, await coro_fn(server, client)
+        finally:
+            await client.close()
+
+    return asyncio.run(main())
+
+
+def test_parse_master_and_pick_variant():
+    variants = parse_playlist(MASTER, "http://example.com/live/master.m3u8")
+    assert [v.url for v in variants] == [
+        "http://example.com/live/low/index.m3u8",
+        "http://example.com/live/high/index.m3u8",
+    ]
+    assert (variants[1].width, variants[1].bandwidth) == (1920, 5000000)
+    assert pick_variant(variants).height == 1080
+    assert pick_variant(variants, max_width=1280).height == 360
+    assert pick_variant(variants, max_width=320).height == 360
+
+
+def test_parse_media_playlist():
+    playlist = parse_playlist(MEDIA, "http://example.com/live/index.m3u8")
+    assert isinstance(playlist, MediaPlaylist)
+    assert playlist.target_duration == 4
+    assert playlist.init_url == "http://example.com/live/init.mp4"
+    assert playlist.segments[-1] == "http://example.com/live/seg2.m4s"
+    assert not playlist.encrypted
+    with pytest.raises(HlsError):
+        parse_playlist("<html></html>", "http://example.com/")
+
+
+def test_latest_segment_with_init_section():
+    async def run(server, client):
+        return await client.latest_segment(server.url + "/master.m3u8")
+
+    server, segment = serve(run)
+    assert segment == b"high-init|high-seg2"
+    assert server.hits["/high/seg1.m4s"] == 0
+
+
+def test_max_width_and_playlist_cache():
+    async def run(server, client):
+        first = await client.latest_segment(server.url + "/master.m3u8", max_width=1280)
+        second = await client.latest_segment(server.url + "/master.m3u8", max_width=1280)
+        return first, second
+
+    server, (first, second) = serve(run)
+    assert first == second == b"low-init|low-seg2"
+    # Both playlists were served from the cache the second time, only the segment is refetched
+    assert server.hits["/master.m3u8"] == 1
+    assert server.hits["/low/index.m3u8"] == 1
+    assert server.hits["/low/seg2.m4s"] == 2
+
+
+def test_fetch_segment_failures():
+    async def run(server, client):
+        return (
+            await client.fetch_segment(server.url + "/missing.m3u8"),
+            await client.fetch_segment(server.url + "/enc.m3u8"),
+        )
+
+    _, results = serve(run)
+    assert results == (None, None)
+
+
+def test_caches_drop_stale_and_oldest_entries(monkeypatch):
+    monkeypatch.setattr(hls, "MAX_CACHED", 3)
+    cache = {}
+    HlsClient._store(cache, "stale", 5.0, "x", now=0.0)
+    HlsClient._store(cache, "a", 20.0, "a", now=10.0)
+    assert list(cache) == ["a"]
+    for key in ("b", "c", "d"):
+        HlsClient._store(cache, key, 20.0, key, now=10.0)
+    assert list(cache) == ["b", "c", "d"]
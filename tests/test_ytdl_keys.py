@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip("yt_dlp")
+pytest.importorskip("redbot")
+
+from ytdl.YouTubeDownloader import YouTubeDownloader  # noqa: E402
+
+resolve = YouTubeDownloader._resolve_id
+
+
+def test_single_video():
+    assert resolve("https://youtu.be/dQw4w9WgXcQ") == ("Youtube", "dQw4w9WgXcQ")
+    assert resolve("https://www.youtube.com/watch?v=dQw4w9WgXcQ") == ("Youtube", "dQw4w9WgXcQ")
+
+
+def test_playlist_param_does_not_collide():
+    first = resolve("https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLbpi6ZahtOH6Blw3RGYpWkSByi_T7Rygb")
+    second = resolve("https://www.youtube.com/watch?v=aaaaaaaaaaa&list=PLbpi6ZahtOH6Blw3RGYpWkSByi_T7Rygb&index=2")
+    assert first == ("Youtube", "dQw4w9WgXcQ")
+    assert second == ("Youtube", "aaaaaaaaaaa")
+
+
+def test_playlist_has_no_offline_key():
+    assert resolve("https://www.youtube.com/playlist?list=PLbpi6ZahtOH6Blw3RGYpWkSByi_T7Rygb") is None
@@ -1,6 +1,13 @@
 import discord
 from redbot.core import commands
-import aiohttp
+try:
+    # Where Red's Downloader installs the repo's shared library
+    from cog_shared.senkohttp import acquire, release
+except ModuleNotFoundError as e:
+    if not (e.name or "").startswith("cog_shared"):
+        raise
+    # Development checkout, the library sits next to the cogs
+    from senkohttp import acquire, release
 import re
 
 TENOR_REGEX = re.compile(r'https://tenor\.com/view/([\w-]+)')
@@ -10,15 +17,17 @@ class TenorLinkExtractor(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.http = acquire(bot)
+
+    async def cog_unload(self):
+        await release(self.bot)
 
     async def get_tenor_gif(self, url):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                if resp.status == 200:
-                    html = await resp.text()
-                    match = re.search(r'"(https://media\.tenor\.com/[^\"]+\.gif)"', html)
-                    if match:
-                        return match.group(1)
+        html = await self.http.get_text(url)
+        if html:
+            match = re.search(r'"(https://media\.tenor\.com/[^\"]+\.gif)"', html)
+            if match:
+                return match.group(1)
         return None
 
     @commands.Cog.listener()
@@ -28,7 +37,7 @@ class TenorLinkExtractor(commands.Cog):
         
         match = TENOR_REGEX.search(message.content)
         if match:
-            direct_gif_url = await self.get_tenor_gif(message.content)
+            direct_gif_url = await self.get_tenor_gif(match.group(0))
             if direct_gif_url:
                 await message.channel.send(f"Direct GIF link: {direct_gif_url}")
 
@@ -1,64 +1,272 @@
 import discord
 import yt_dlp
-import subprocess
 import os
 import asyncio
-import requests
+import functools
+import uuid
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from redbot.core import commands
 
-# Filebin API details
-BASE_URL = "https://filebin.net/api/v2"
-
-# Function to upload the file to Filebin
-def upload_file(bin_name, file_path, filename, custom_id=None):
-    url = f"{BASE_URL}/{bin_name}/{filename}"
-    headers = {}
-    if custom_id:
-        headers["cid"] = custom_id
-    
-    with open(file_path, 'rb') as file:
-        response = requests.post(url, headers=headers, files={filename: file})
-    
-    if response.status_code == 201:
-        return response.json().get('url')  # Returning the Filebin URL if the upload was successful
-    else:
-        print(f"Filebin upload failed: {response.status_code}, {response.text}")
-        return None
+from .cache import DownloadCache, cache_key
+from .filebin import FilebinUploader, UploadStatus
+from .fit import FALLBACK_FORMAT, estimate_size, pick_format, transcode_to_size, video_bitrate_for
+from .pipeline import AUDIO_TARGETS, FRAGMENT_CONCURRENCY, stream_audio
+from .probe import ProbeCache
+from .scheduler import BatchStatus, DownloadScheduler, JobStatus
+from .singleflight import SingleFlight
+
+DOWNLOAD_DIR = "Downloads"
+# Videos downloaded in parallel per batch, and the most a batch may contain
+BATCH_PARALLEL = 3
+MAX_BATCH = 50
+BATCH_FILETYPES = ("mp4", "fit", *AUDIO_TARGETS)
+# Query parameters that only say which playlist a video was opened from
+PLAYLIST_PARAMS = ("list", "index", "start_radio")
+
+
+class YtdlError(Exception):
+    """A download job failed; the message is shown to the user."""
+
 
 class YouTubeDownloader(commands.Cog):
     """Download and process YouTube videos for Discord"""
 
     def __init__(self, bot):
         self.bot = bot
+        self.scheduler = DownloadScheduler()
+        self.cache = DownloadCache(os.path.join(DOWNLOAD_DIR, "cache"))
+        self.inflight = SingleFlight()
+        self.cache.in_use = self.inflight
+        self.filebin = FilebinUploader()
+        self.probes = ProbeCache(os.path.join(DOWNLOAD_DIR, "probe"))
+
+    def cog_unload(self):
+        self.scheduler.shutdown()
+        self.cache.save()
+        asyncio.create_task(self.filebin.close())
+
+    @staticmethod
+    def _download_result(ydl, info_dict: dict) -> dict:
+        downloads = info_dict.get("requested_downloads") or []
+        if downloads and downloads[0].get("filepath"):
+            file_path = downloads[0]["filepath"]
+        else:
+            file_path = ydl.prepare_filename(info_dict)
+        return {
+            "filepath": file_path,
+            "extractor": info_dict.get("extractor_key") or info_dict.get("extractor"),
+            "id": info_dict.get("id"),
+            "title": info_dict.get("title"),
+        }
+
+    @staticmethod
+    def _extract_info(url: str) -> dict:
+        """Blocking metadata-only extraction, runs in a worker thread."""
+        with yt_dlp.YoutubeDL({"quiet": True, "noplaylist": True}) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    @classmethod
+    def _process_info(cls, info_dict: dict, ydl_opts: dict) -> dict:
+        """Downloads an already extracted video without fetching its page again."""
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info_dict = ydl.process_ie_result(info_dict, download=True)
+            return cls._download_result(ydl, info_dict)
+
+    @staticmethod
+    def _upload_limit(ctx) -> int:
+        """Largest attachment the bot can send in this channel, in bytes."""
+        if ctx and ctx.guild:
+            return ctx.guild.filesize_limit
+        return 10 * 1024 * 1024
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _resolve_id(url: str):
+        """Works out (extractor, video ID) from the URL alone, without touching the network.
+
+        Returns None unless the URL is known to be a single video; the key then comes from
+        the extracted info instead, so a playlist ID never stands in for a video's.
+        """
+        # Downloads run with noplaylist, so "watch?v=...&list=..." means just the video
+        parts = urlsplit(url)
+        query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in PLAYLIST_PARAMS]
+        url = urlunsplit(parts._replace(query=urlencode(query)))
+        for ie in yt_dlp.extractor.gen_extractor_classes():
+            if ie.ie_key() == "Generic":
+                continue
+            if ie.suitable(url):
+                if not ie.is_single_video(url):
+                    return None
+                video_id = ie.get_temp_id(url)
+                return (ie.ie_key(), video_id) if video_id else None
+        return None
+
+    def _probe_sync(self, url: str, key: str) -> dict:
+        return self.probes.put(key, self._extract_info(url))
+
+    async def probe(self, url: str, fresh: bool = False, ctx=None):
+        """Returns ``(info_dict, cached)`` for the URL, from the metadata cache if possible.
+
+        Extraction hits the network, so it waits for a scheduler slot like a download.
+        Raises yt_dlp.DownloadError if the URL can't be extracted.
+        """
+        loop = asyncio.get_running_loop()
+        resolved = await loop.run_in_executor(None, self._resolve_id, url)
+        # Video IDs are case-sensitive, only the extractor name is normalised
+        key = f"{resolved[0].lower()}:{resolved[1]}" if resolved else f"url:{url}"
+        if fresh:
+            # The cached formats went stale, don't hand them out again if re-extracting fails
+            await loop.run_in_executor(None, self.probes.invalidate, key)
+        else:
+            info = await loop.run_in_executor(None, self.probes.get, key)
+            if info:
+                return info, True
+        guild_id = ctx.guild.id if ctx and ctx.guild else None
+        user_id = ctx.author.id if ctx else None
+        return await self.scheduler.run(guild_id, user_id, self._probe_sync, url, key), False
+
+    async def _download_probed(self, url: str, info: dict, cached: bool, ydl_opts: dict, ctx=None, status: JobStatus = None) -> dict:
+        """Downloads from already extracted metadata, re-extracting once if cached format URLs went stale."""
+        guild_id = ctx.guild.id if ctx and ctx.guild else None
+        user_id = ctx.author.id if ctx else None
+        try:
+            return await self.scheduler.run(guild_id, user_id, self._process_info, info, ydl_opts, status=status)
+        except yt_dlp.DownloadError:
+            if not cached:
+                raise
+        info, _ = await self.probe(url, fresh=True, ctx=ctx)
+        return await self.scheduler.run(guild_id, user_id, self._process_info, info, ydl_opts, status=status)
 
-    async def download_youtube_video(self, url: str, audio_only: bool = False, filetype: str = "mp4") -> str:
-        """Downloads a YouTube video or audio and returns the file path."""
-        output_path = "Downloads"
+    async def _report_progress(self, message, status: JobStatus, interval: float = 3):
+        """Edit ``message`` with the job's queue position / progress until it is done."""
+        last = None
+        while not status.done:
+            text = status.render()
+            if text != last:
+                try:
+                    await message.edit(content=text)
+                except discord.HTTPException:
+                    pass
+                last = text
+            await asyncio.sleep(interval)
+
+    async def download_youtube_video(self, url: str, audio_only: bool = False, filetype: str = "mp4", ctx=None, status: JobStatus = None) -> dict:
+        """Downloads a YouTube video or audio and returns its file path, extractor, ID and title.
+
+        The download runs in the scheduler's worker pool so it doesn't block the bot.
+        """
+        output_path = DOWNLOAD_DIR
         os.makedirs(output_path, exist_ok=True)
+        # Name files by video ID so jobs for different videos never share a path
+        outtmpl = f"{output_path}/%(extractor_key)s-%(id)s-{filetype.lower()}.%(ext)s"
 
         if audio_only:
             # Download the best audio only (convert to MP3 later)
             ydl_opts = {
                 "format": "bestaudio/best",
-                "outtmpl": f"{output_path}/%(title)s.%(ext)s",
+                "outtmpl": outtmpl,
                 "noplaylist": True,  # Ensure single video, not playlist
             }
         else:
             # Default: Force MP4 format if video
             ydl_opts = {
                 "format": "bestvideo[ext=mp4]+bestaudio[ext=m4a]/mp4",  # Always prefer MP4
-                "outtmpl": f"{output_path}/%(title)s.%(ext)s",
+                "outtmpl": outtmpl,
                 "noplaylist": True,  # Ensure single video, not playlist
             }
 
+        status = status or JobStatus()
+        ydl_opts["progress_hooks"] = [status.hook]
+        ydl_opts["quiet"] = True
+        ydl_opts["concurrent_fragment_downloads"] = FRAGMENT_CONCURRENCY
+
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info_dict = ydl.extract_info(url, download=True)
-                return ydl.prepare_filename(info_dict)
+            info, cached = await self.probe(url, ctx=ctx)
+            return await self._download_probed(url, info, cached, ydl_opts, ctx=ctx, status=status)
         except yt_dlp.DownloadError as e:
             print(f"Download error: {e}")
             return None
 
+    async def download_to_fit(self, url: str, size_limit: int, ctx=None, status: JobStatus = None) -> dict:
+        """Downloads the best format that fits in ``size_limit`` bytes.
+
+        Formats are picked from the extracted metadata before anything is downloaded.
+        If none fits, a small format is downloaded and transcoded down to size.
+        Raises YtdlError if the video can't be made to fit.
+        """
+        os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+        status = status or JobStatus()
+
+        try:
+            info, cached = await self.probe(url, ctx=ctx)
+        except yt_dlp.DownloadError as e:
+            raise YtdlError("Couldn't read that link.") from e
+
+        picked = pick_format(info, size_limit)
+        video_kbps = None
+        if picked is None:
+            video_kbps = video_bitrate_for(info.get("duration"), size_limit)
+            if video_kbps is None:
+                raise YtdlError("That video is too long to fit in the upload limit here.")
+
+        ydl_opts = {
+            "format": picked[0] if picked else FALLBACK_FORMAT,
+            "outtmpl": f"{DOWNLOAD_DIR}/%(extractor_key)s-%(id)s-fit.%(ext)s",
+            "merge_output_format": "mp4",
+            "concurrent_fragment_downloads": FRAGMENT_CONCURRENCY,
+            "noplaylist": True,
+            "quiet": True,
+            "progress_hooks": [status.hook],
+        }
+        try:
+            result = await self._download_probed(url, info, cached, ydl_opts, ctx=ctx, status=status)
+        except yt_dlp.DownloadError as e:
+            raise YtdlError("Failed to download.") from e
+
+        if video_kbps is not None or os.path.getsize(result["filepath"]) > size_limit:
+            # Nothing fit (or the estimate was off): squeeze it down to size
+            if video_kbps is None:
+                video_kbps = video_bitrate_for(info.get("duration"), size_limit)
+                if video_kbps is None:
+                    os.remove(result["filepath"])
+                    raise YtdlError("That video is too long to fit in the upload limit here.")
+            source = result["filepath"]
+            out_path = source.rsplit(".", 1)[0] + "-small.mp4"
+            guild_id = ctx.guild.id if ctx and ctx.guild else None
+            user_id = ctx.author.id if ctx else None
+            status.state = "queued"
+            try:
+                # A two-pass encode is as heavy as a download, so it takes a slot too
+                async with self.scheduler.slot(guild_id, user_id, status):
+                    status.state = "transcoding"
+                    ok = await transcode_to_size(source, out_path, video_kbps)
+            finally:
+                os.remove(source)
+            if not ok:
+                raise YtdlError("Failed to shrink the video to fit.")
+            result["filepath"] = out_path
+        return result
+
+    async def stream_audio_file(self, url: str, filetype: str, ctx=None, status: JobStatus = None) -> dict:
+        """Streams audio from yt-dlp straight into ffmpeg, so the source file is never written.
+
+        Returns the same dict as ``download_youtube_video``, or None on failure.
+        """
+        os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+        out_path = os.path.join(DOWNLOAD_DIR, f"stream-{uuid.uuid4().hex}.{filetype}")
+        guild_id = ctx.guild.id if ctx and ctx.guild else None
+        user_id = ctx.author.id if ctx else None
+
+        try:
+            async with self.scheduler.slot(guild_id, user_id, status):
+                result = await stream_audio(url, filetype, out_path, status)
+        except FileNotFoundError:
+            print("ffmpeg not found in PATH, can't stream audio.")
+            return None
+        if not result:
+            return None
+        return {"filepath": out_path, "extractor": result.extractor, "id": result.id, "title": result.title}
+
     async def convert_to_mp3(self, file_path: str) -> str:
         """Convert the downloaded file to MP3 format using FFmpeg and return the new file path."""
         mp3_file = file_path.rsplit('.', 1)[0] + ".mp3"
@@ -79,13 +287,10 @@ class YouTubeDownloader(commands.Cog):
             print(f"Error converting to MP3: {e}")
             return None
 
-    async def upload_to_filebin(self, file_path: str) -> str:
-        """Uploads the file to Filebin and returns the filebin URL."""
+    async def upload_to_filebin(self, file_path: str, file_name: str = None, status: UploadStatus = None) -> str:
+        """Uploads the file to a new Filebin bin and returns the filebin URL."""
         try:
-            file_name = os.path.basename(file_path)
-            bin_name = "your_bin_name"  # You can change this to a dynamic bin name if needed
-            filebin_url = upload_file(bin_name, file_path, file_name)
-            return filebin_url
+            return await self.filebin.upload(file_path, file_name, status=status)
         except Exception as e:
             print(f"Error uploading to Filebin: {e}")
             return None
@@ -103,57 +308,317 @@ class YouTubeDownloader(commands.Cog):
             print(f"Error getting debug info: {e}")
             return None
 
-    @commands.command()
+    async def job_key(self, url: str, filetype: str):
+        """Cache / in-flight key for the URL, or None if the video ID can't be worked out offline."""
+        resolved = await asyncio.get_running_loop().run_in_executor(None, self._resolve_id, url)
+        if resolved:
+            return cache_key(*resolved, filetype)
+        return None
+
+    async def get_file(self, ctx, url: str, filetype: str, status: JobStatus = None, key: str = None, size_limit: int = None):
+        """Returns ``(file_path, title, cached)`` for the URL, from the cache or a fresh download.
+
+        Cached files belong to the cache and must not be deleted by the caller.
+        Raises YtdlError if the download or conversion fails.
+        """
+        filetype = filetype.lower()
+
+        if key:
+            hit = self.cache.get(key)
+            if hit:
+                return hit[0], hit[1], True
+
+        info = None
+        if filetype == "fit":
+            info = await self.download_to_fit(url, size_limit or self._upload_limit(ctx), ctx=ctx, status=status)
+        elif filetype in AUDIO_TARGETS:
+            info = await self.stream_audio_file(url, filetype, ctx=ctx, status=status)
+            if not info and filetype != "mp3":
+                raise YtdlError(f"Failed to download {filetype.upper()}.")
+        if not info:
+            # Video, or the old download-then-convert path if MP3 streaming didn't work
+            info = await self.download_youtube_video(url, filetype == "mp3", filetype, ctx=ctx, status=status)
+        if not info:
+            raise YtdlError("Failed to download.")
+        file_path = info["filepath"]
+
+        if filetype == "mp3" and not file_path.endswith(".mp3"):
+            mp3_file = await self.convert_to_mp3(file_path)
+            os.remove(file_path)
+            if not mp3_file:
+                raise YtdlError("Failed to convert to MP3.")
+            file_path = mp3_file
+
+        if key is None and info["extractor"] and info["id"]:
+            key = cache_key(info["extractor"], info["id"], self._variant(filetype, size_limit))
+        if key:
+            cached_path = self.cache.put(key, file_path, info["title"])
+            if cached_path:
+                return cached_path, info["title"], True
+        return file_path, info["title"], False
+
+    @staticmethod
+    def _remove_uncached(result):
+        file_path, _, cached = result
+        # Cached files stay around for the next request
+        if not cached and os.path.exists(file_path):
+            os.remove(file_path)
+
+    @staticmethod
+    def _variant(filetype: str, size_limit: int = None) -> str:
+        # Fit downloads depend on the upload limit they were made for
+        if filetype == "fit":
+            return f"fit{size_limit}"
+        return filetype
+
+    def join_job(self, ctx, url: str, filetype: str, key: str = None, status: JobStatus = None, size_limit: int = None):
+        """Starts a download job, or attaches to the running one for the same video and filetype.
+
+        The returned flight must be passed to ``self.inflight.leave`` once the file has been sent.
+        """
+        filetype = filetype.lower()
+        status = status or JobStatus(f"Downloading {filetype.upper()}")
+        # Without a video ID, only identical URLs can share a job
+        flight_key = key or f"url:{url}:{self._variant(filetype, size_limit)}"
+        return self.inflight.join(
+            flight_key,
+            lambda: self.get_file(ctx, url, filetype, status=status, key=key, size_limit=size_limit),
+            status=status,
+            cleanup=self._remove_uncached,
+        )
+
+    @staticmethod
+    def _display_name(file_path: str, title: str = None) -> str:
+        ext = file_path.rsplit(".", 1)[-1]
+        if not title:
+            return os.path.basename(file_path)
+        return f"{yt_dlp.utils.sanitize_filename(title)}.{ext}"
+
+    async def deliver(self, ctx, url: str, filetype: str, debug: bool = False, status_msg=None, batch: bool = False) -> bool:
+        """Downloads (or joins the running job for) one URL and sends the result to ``ctx``.
+
+        ``status_msg`` is kept updated with the job's progress if given. In batch mode the
+        chatty status messages are skipped. Returns True if the file was delivered.
+        """
+        size_limit = self._upload_limit(ctx) if filetype == "fit" else None
+        key = await self.job_key(url, self._variant(filetype, size_limit))
+
+        # Download the video or audio (or take it from the cache, or wait for
+        # someone else's download of the same video)
+        flight = self.join_job(ctx, url, filetype, key=key, size_limit=size_limit)
+        reporter = None
+        if status_msg is not None:
+            reporter = asyncio.create_task(self._report_progress(status_msg, flight.status))
+        try:
+            try:
+                result = await flight.wait()
+            except YtdlError as e:
+                await ctx.send(f"<{url}>: {e}" if batch else str(e))
+                return False
+            finally:
+                if reporter:
+                    reporter.cancel()
+            return await self._send_result(ctx, result, filetype in AUDIO_TARGETS, debug, batch=batch)
+        finally:
+            self.inflight.leave(flight)
+
+    @commands.group(invoke_without_command=True)
     async def ytdl(self, ctx, url: str, filetype: str = "mp4", debug: bool = False):
-        """Downloads a YouTube video or MP3. If MP4, uploads to Filebin if over 10MB."""
-        audio_only = filetype.lower() == "mp3"
+        """Downloads a YouTube video or audio (mp3, opus, m4a).
+
+        Use `fit` as the filetype to get the best quality that fits in this server's upload limit.
+        Videos too big to attach are uploaded to Filebin.
+        """
+        filetype = filetype.lower()
+        status_msg = await ctx.send(f"Downloading {filetype.upper()}...")
+        await self.deliver(ctx, url, filetype, debug, status_msg=status_msg)
 
-        await ctx.send(f"Downloading {filetype.upper()}...")
+    @staticmethod
+    def _expand(url: str) -> list:
+        """Blocking flat extraction of a playlist into its video URLs."""
+        with yt_dlp.YoutubeDL({"quiet": True, "extract_flat": "in_playlist"}) as ydl:
+            info = ydl.extract_info(url, download=False)
+        if info.get("_type") not in ("playlist", "multi_video"):
+            return [url]
+        urls = []
+        for entry in info.get("entries") or []:
+            entry_url = entry and (entry.get("webpage_url") or entry.get("url"))
+            if entry_url:
+                urls.append(entry_url)
+        return urls
 
-        # Download the video or audio
-        file_path = await self.download_youtube_video(url, audio_only, filetype)
+    @ytdl.command(name="info")
+    async def ytdl_info(self, ctx, url: str):
+        """Shows a video's title, length and estimated download sizes without downloading it."""
+        async with ctx.typing():
+            try:
+                info, cached = await self.probe(url, ctx=ctx)
+            except yt_dlp.DownloadError as e:
+                print(f"Download error: {e}")
+                return await ctx.send("Couldn't read that link.")
 
-        if not file_path:
-            return await ctx.send("Failed to download.")
+        duration = info.get("duration")
+        lines = [f"**{info.get('title') or info.get('id')}**"]
+        if info.get("uploader"):
+            lines[0] += f" by {info['uploader']}"
+        if duration:
+            lines.append(f"Length: {int(duration) // 60}:{int(duration) % 60:02d}")
+
+        best = pick_format(info, float("inf"))
+        if best:
+            lines.append(f"Best video: ~{best[1] / (1024 * 1024):.1f} MB")
+        limit = self._upload_limit(ctx)
+        fit = pick_format(info, limit)
+        if fit:
+            lines.append(f"Fits here ({limit // (1024 * 1024)} MB): `{fit[0]}`, ~{fit[1] / (1024 * 1024):.1f} MB")
+        elif video_bitrate_for(duration, limit):
+            lines.append(f"Fits here ({limit // (1024 * 1024)} MB): only after transcoding")
+        else:
+            lines.append(f"Too long to fit in {limit // (1024 * 1024)} MB")
+        audio_sizes = [
+            estimate_size(f, duration) for f in info.get("formats") or []
+            if f.get("acodec") not in (None, "none") and f.get("vcodec") == "none"
+        ]
+        audio_sizes = [size for size in audio_sizes if size]
+        if audio_sizes:
+            lines.append(f"Best audio: ~{max(audio_sizes) / (1024 * 1024):.1f} MB")
+        if cached:
+            lines.append("_(from cache)_")
+        await ctx.send("\n".join(lines))
+
+    @ytdl.command(name="batch")
+    async def ytdl_batch(self, ctx, *args: str):
+        """Downloads a playlist or several URLs, sending each file as soon as it's done.
+
+        Usage: `[p]ytdl batch [filetype] <url> [url...]`
+        """
+        filetype = "mp4"
+        if args and args[0].lower() in BATCH_FILETYPES:
+            filetype, args = args[0].lower(), args[1:]
+        if not args:
+            return await ctx.send_help()
+
+        status_msg = await ctx.send("Expanding playlist...")
+        guild_id = ctx.guild.id if ctx.guild else None
+        urls = []
+        for url in args:
+            try:
+                urls += await self.scheduler.run(guild_id, ctx.author.id, self._expand, url)
+            except yt_dlp.DownloadError as e:
+                print(f"Download error: {e}")
+                await ctx.send(f"<{url}>: couldn't read that link.")
+        if len(urls) > MAX_BATCH:
+            await ctx.send(f"Only the first {MAX_BATCH} of {len(urls)} videos will be downloaded.")
+            urls = urls[:MAX_BATCH]
+        if not urls:
+            return await status_msg.edit(content="Nothing to download.")
+
+        progress = BatchStatus(len(urls), filetype)
+        reporter = asyncio.create_task(self._report_progress(status_msg, progress))
+        # Items queue up in the scheduler, which interleaves them with other users' jobs
+        limit = asyncio.Semaphore(BATCH_PARALLEL)
+
+        async def run_item(item_url):
+            async with limit:
+                try:
+                    ok = await self.deliver(ctx, item_url, filetype, batch=True)
+                except Exception as e:
+                    # One broken item mustn't take the rest of the batch down with it
+                    print(f"Batch item {item_url} failed: {e!r}")
+                    ok = False
+                    try:
+                        await ctx.send(f"<{item_url}>: something went wrong.")
+                    except discord.HTTPException:
+                        pass
+            if ok:
+                progress.finished += 1
+            else:
+                progress.failed += 1
+
+        try:
+            await asyncio.gather(*(run_item(u) for u in urls))
+        finally:
+            progress.done = True
+            reporter.cancel()
+        await status_msg.edit(content=progress.render())
+
+    async def _send_result(self, ctx, result, audio_only: bool, debug: bool = False, batch: bool = False) -> bool:
+        file_path, title, cached = result
+        display_name = self._display_name(file_path, title)
+        label = f"**{title or display_name}**" if batch else None
 
         # Debug: Show debug info if enabled
         if debug:
             debug_info = await self.debug_info(file_path)
             if debug_info:
-                await ctx.send(f"Debug Info:\n{debug_info}")
-        
+                source = "cache hit" if cached else "downloaded"
+                await ctx.send(
+                    f"Debug Info:\n{debug_info}\nSource: {source}\n{self.cache.stats()}\n{self.probes.stats()}"
+                )
+
         try:
             if audio_only:
-                if not file_path.endswith(".mp3"):
-                    mp3_file = await self.convert_to_mp3(file_path)
-                    if not mp3_file:
-                        return await ctx.send("Failed to convert to MP3.")
-                    await ctx.send("Uploading MP3 file...")
-                    await ctx.send(file=discord.File(mp3_file))
-                    os.remove(mp3_file)
-                else:
-                    await ctx.send("Uploading audio file...")
-                    await ctx.send(file=discord.File(file_path))
-                os.remove(file_path)
-                return
-
-            await ctx.send("Checking if upload is needed...")
+                if not batch:
+                    await ctx.send(f"Uploading {file_path.rsplit('.', 1)[-1].upper()} file...")
+                await ctx.send(label, file=discord.File(file_path, filename=display_name))
+                return True
+
+            if not batch:
+                await ctx.send("Checking if upload is needed...")
             file_size = os.path.getsize(file_path)
 
-            if file_size > 10 * 1024 * 1024:  # If file is larger than 10MB, upload to Filebin
-                filebin_url = await self.upload_to_filebin(file_path)
+            if file_size > self._upload_limit(ctx):  # Too big to attach here, upload to Filebin
+                upload_status = UploadStatus()
+                reporter = None
+                if not batch:
+                    status_msg = await ctx.send(upload_status.render())
+                    reporter = asyncio.create_task(self._report_progress(status_msg, upload_status))
+                try:
+                    filebin_url = await self.upload_to_filebin(file_path, display_name, upload_status)
+                finally:
+                    upload_status.done = True
+                    if reporter:
+                        reporter.cancel()
                 if filebin_url:
-                    await ctx.send(f"File uploaded to Filebin: {filebin_url}")
-                    os.remove(file_path)  # Clean up the original file after upload
-                else:
-                    await ctx.send("Upload to Filebin failed.")
-            else:
-                # If file is smaller than 10MB, just send it
+                    await ctx.send(f"{label + ' ' if label else ''}File uploaded to Filebin: {filebin_url}")
+                    return True
+                await ctx.send(f"{label + ' ' if label else ''}Upload to Filebin failed.")
+                return False
+
+            # Small enough to attach, just send it
+            if not batch:
                 await ctx.send("Uploading video...")
-                await ctx.send(file=discord.File(file_path))
-                os.remove(file_path)
+            await ctx.send(label, file=discord.File(file_path, filename=display_name))
+            return True
 
         except Exception as e:
             await ctx.send("An error occurred during processing.")
             print(e)
-            os.remove(file_path)
+            return False
+
+    @commands.command()
+    @commands.is_owner()
+    async def ytdllimits(self, ctx, global_limit: int = None, per_guild: int = None, per_user: int = None):
+        """Show or set how many downloads may run at once (globally, per server, per user)."""
+        if any(v is not None and v < 1 for v in (global_limit, per_guild, per_user)):
+            return await ctx.send("Limits must be at least 1.")
+        await self.scheduler.set_limits(global_limit, per_guild, per_user)
+        s = self.scheduler
+        await ctx.send(
+            f"Global: {s.global_limit}, per server: {s.guild_limit}, per user: {s.user_limit}\n"
+            f"Running: {s.running}, queued: {s.queued}"
+        )
+
+    @commands.command()
+    @commands.is_owner()
+    async def ytdlcache(self, ctx, size_mb: str = None):
+        """Show cache stats, set the cache size in MB, or `clear` it."""
+        if size_mb == "clear":
+            self.cache.clear()
+        elif size_mb is not None:
+            if not size_mb.isdigit():
+                return await ctx.send("Give a size in MB or `clear`.")
+            self.cache.max_bytes = int(size_mb) * 1024 * 1024
+            self.cache.evict()
+            self.cache.save()
+        await ctx.send(self.cache.stats())
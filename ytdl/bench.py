@@ -0,0 +1,309 @@
+"""Benchmark for the ytdl download/convert/upload pipeline.
+
+Drives the cog with a fake ctx against a local HTTP server serving generated fixture
+media (downloaded through yt-dlp's generic extractor) and a local Filebin stand-in,
+then prints one JSON report so runs on different revisions can be compared.
+
+    python -m ytdl.bench --duration 20 --runs 3 --output bench.json
+
+Needs ffmpeg, yt-dlp, aiohttp and Red installed.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from aiohttp import web
+
+from benchtools import LoopMonitor, revision
+
+from .YouTubeDownloader import YouTubeDownloader
+from .filebin import CHUNK_SIZE, FilebinUploader
+
+SCENARIOS = ("mp4", "mp4-filebin", "mp3", "mp4-cached")
+
+
+class FakeMessage:
+    async def edit(self, **kwargs):
+        pass
+
+
+class FakeGuild:
+    def __init__(self, filesize_limit: int):
+        self.id = 1
+        self.filesize_limit = filesize_limit
+
+
+class FakeAuthor:
+    id = 1
+
+
+class FakeTyping:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeContext:
+    """Just enough of commands.Context for the cog. Reads sent files like an upload would."""
+
+    def __init__(self, filesize_limit: int, stages: dict, counters: dict):
+        self.guild = FakeGuild(filesize_limit)
+        self.author = FakeAuthor()
+        self.stages = stages
+        self.counters = counters
+        self.messages = []
+
+    def typing(self):
+        return FakeTyping()
+
+    async def send_help(self):
+        pass
+
+    async def send(self, content=None, file=None, **kwargs):
+        self.messages.append(content)
+        if file is not None:
+            start = time.perf_counter()
+            with file.fp as fp:
+                while True:
+                    chunk = fp.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    self.counters["discord"] += len(chunk)
+            self.stages["discord_send"] = self.stages.get("discord_send", 0) + time.perf_counter() - start
+        return FakeMessage()
+
+
+class FakeBot:
+    def __init__(self, loop):
+        self.loop = loop
+
+
+class DiskSampler(threading.Thread):
+    """Tracks the largest total size of a directory tree, sampled from a thread."""
+
+    def __init__(self, path: str, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.high_water = 0
+        self._halt = threading.Event()
+
+    def sample(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def run(self):
+        while not self._halt.is_set():
+            self.high_water = max(self.high_water, self.sample())
+            self._halt.wait(self.interval)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+def make_fixture(path: str, duration: int):
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", "testsrc=size=1280x720:rate=30",
+            "-f", "lavfi", "-i", "sine=frequency=440",
+            "-t", str(duration),
+            "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac",
+            "-movflags", "+faststart", path,
+        ],
+        check=True,
+    )
+
+
+async def start_servers(media_dir: str, counters: dict):
+    """Fixture media server and Filebin stand-in on one local aiohttp app."""
+
+    async def media(request):
+        path = os.path.join(media_dir, os.path.basename(request.match_info["name"]))
+        if not os.path.exists(path):
+            raise web.HTTPNotFound()
+        counters["served_requests"] += 1
+        # Count what's actually requested (yt-dlp may use Range requests)
+        size = os.path.getsize(path)
+        if request.http_range.start is not None or request.http_range.stop is not None:
+            start, stop, _ = request.http_range.indices(size)
+            counters["served"] += stop - start
+        elif request.method != "HEAD":
+            counters["served"] += size
+        return web.FileResponse(path, headers={"Content-Type": "video/mp4"})
+
+    async def filebin(request):
+        async for chunk in request.content.iter_chunked(CHUNK_SIZE):
+            counters["filebin"] += len(chunk)
+        return web.json_response({"bin": request.match_info["bin"]}, status=201)
+
+    app = web.Application(client_max_size=1024 ** 3)
+    app.router.add_get("/media/{name}", media)
+    app.router.add_post("/{bin}/{filename}", filebin)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def _timed(stages: dict, name: str, func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            stages[name] = stages.get(name, 0) + time.perf_counter() - start
+
+    return wrapper
+
+
+def make_cog(loop, base_url: str, stages: dict) -> YouTubeDownloader:
+    cog = YouTubeDownloader(FakeBot(loop))
+    cog.filebin = FilebinUploader(base_url=base_url)
+    cog.cache.clear()
+    for attr, stage in (
+        ("probe", "extract"),
+        ("_download_probed", "download"),
+        ("stream_audio_file", "stream_audio"),
+        ("convert_to_mp3", "convert"),
+        ("upload_to_filebin", "filebin_upload"),
+    ):
+        setattr(cog, attr, _timed(stages, stage, getattr(cog, attr)))
+    return cog
+
+
+async def run_scenario(scenario: str, media_url: str, base_url: str, fixture_size: int, counters: dict) -> dict:
+    """Runs one ``[p]ytdl`` request. ``counters`` is shared with the local servers."""
+    loop = asyncio.get_running_loop()
+    stages = {}
+    filetype = "mp3" if scenario == "mp3" else "mp4"
+    # Force the Filebin path by making the fixture bigger than the upload limit
+    limit = fixture_size // 2 if scenario == "mp4-filebin" else fixture_size * 4
+
+    cog = make_cog(loop, base_url, stages)
+    if scenario == "mp4-cached":
+        await cog.deliver(FakeContext(limit, {}, counters), media_url, filetype)
+        stages.clear()
+
+    ctx = FakeContext(limit, stages, counters)
+    monitor = LoopMonitor()
+    monitor_task = asyncio.create_task(monitor.run())
+    sampler = DiskSampler(os.path.abspath("Downloads"))
+    sampler.start()
+    counters_before = dict(counters)
+    start = time.perf_counter()
+    try:
+        ok = await cog.deliver(ctx, media_url, filetype)
+    finally:
+        wall = time.perf_counter() - start
+        sampler.stop()
+        monitor_task.cancel()
+        await cog.filebin.close()
+        cog.scheduler.shutdown()
+
+    return {
+        "scenario": scenario,
+        "ok": ok,
+        "wall_s": wall,
+        "stages_s": stages,
+        "bytes": {k: counters[k] - counters_before.get(k, 0) for k in counters},
+        "disk_high_water_bytes": sampler.high_water,
+        "loop_blocked_s": monitor.blocked,
+        "loop_max_lag_s": monitor.max_lag,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "children_peak_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+
+
+def summarize(runs: list) -> dict:
+    summary = {}
+    for scenario in {r["scenario"] for r in runs}:
+        results = [r for r in runs if r["scenario"] == scenario]
+        stage_names = {name for r in results for name in r["stages_s"]}
+        summary[scenario] = {
+            "wall_s_median": statistics.median(r["wall_s"] for r in results),
+            "stages_s_median": {
+                name: statistics.median(r["stages_s"].get(name, 0) for r in results) for name in sorted(stage_names)
+            },
+            "loop_blocked_s_median": statistics.median(r["loop_blocked_s"] for r in results),
+            "disk_high_water_bytes_max": max(r["disk_high_water_bytes"] for r in results),
+        }
+    return summary
+
+
+async def main(args):
+    workdir = tempfile.mkdtemp(prefix="ytdl-bench-")
+    media_dir = os.path.join(workdir, "media")
+    os.makedirs(media_dir)
+    fixture = os.path.join(media_dir, "fixture.mp4")
+    make_fixture(fixture, args.duration)
+    fixture_size = os.path.getsize(fixture)
+
+    counters = {"served": 0, "served_requests": 0, "filebin": 0, "discord": 0}
+    runner, base_url = await start_servers(media_dir, counters)
+    old_cwd = os.getcwd()
+    # The cog writes into ./Downloads, keep that inside the scratch dir
+    os.chdir(workdir)
+    runs = []
+    try:
+        for scenario in args.scenarios:
+            for _ in range(args.runs):
+                shutil.rmtree("Downloads", ignore_errors=True)
+                runs.append(
+                    await run_scenario(scenario, f"{base_url}/media/fixture.mp4", base_url, fixture_size, counters)
+                )
+    finally:
+        os.chdir(old_cwd)
+        await runner.cleanup()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "revision": revision(),
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "fixture": {"duration_s": args.duration, "size_bytes": fixture_size},
+        "runs": runs,
+        "summary": summarize(runs),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=int, default=20, help="length of the fixture video in seconds")
+    parser.add_argument("--runs", type=int, default=3, help="runs per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
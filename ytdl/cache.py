@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+# Default cache size, can be changed with [p]ytdlcache size
+MAX_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+
+
+def cache_key(extractor: str, video_id: str, filetype: str) -> str:
+    return f"{extractor.lower()}:{video_id}:{filetype.lower()}"
+
+
+class DownloadCache:
+    """On-disk cache of finished downloads, keyed by extractor, video ID and filetype.
+
+    Files are stored under a hash of the key, and an ``index.json`` keeps their size,
+    title and last use time so the least recently used entries can be evicted once
+    the cache grows past ``max_bytes``.
+    """
+
+    def __init__(self, root: str, max_bytes: int = MAX_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(root, "index.json")
+        self.hits = 0
+        self.misses = 0
+        # Keys that must not be evicted right now (e.g. files still being sent)
+        self.in_use = set()
+        os.makedirs(root, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Drop entries whose file went missing
+        return {k: v for k, v in index.items() if os.path.exists(os.path.join(self.root, v["file"]))}
+
+    def save(self):
+        tmp = self.index_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_file)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(e["size"] for e in self.index.values())
+
+    def path_for(self, key: str, ext: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+        return os.path.join(self.root, f"{digest}.{ext}")
+
+    def get(self, key: str):
+        """Returns ``(path, title)`` for a cached download, or None."""
+        entry = self.index.get(key)
+        if entry:
+            path = os.path.join(self.root, entry["file"])
+            if os.path.exists(path):
+                entry["last_used"] = time.time()
+                self.hits += 1
+                return path, entry.get("title")
+            del self.index[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, file_path: str, title: str = None):
+        """Moves ``file_path`` into the cache. Returns the cached path, or None if it doesn't fit."""
+        size = os.path.getsize(file_path)
+        if size > self.max_bytes:
+            return None
+        ext = file_path.rsplit(".", 1)[-1]
+        dest = self.path_for(key, ext)
+        shutil.move(file_path, dest)
+        self.index[key] = {
+            "file": os.path.basename(dest),
+            "size": size,
+            "title": title,
+            "last_used": time.time(),
+        }
+        self.evict()
+        self.save()
+        return dest
+
+    def evict(self, max_bytes: int = None):
+        """Removes least recently used entries until the cache fits in ``max_bytes``."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        total = self.total_bytes
+        for key, entry in sorted(self.index.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= limit:
+                break
+            if key in self.in_use:
+                continue
+            try:
+                os.remove(os.path.join(self.root, entry["file"]))
+            except FileNotFoundError:
+                pass
+            total -= entry["size"]
+            del self.index[key]
+
+    def clear(self):
+        self.evict(0)
+        self.save()
+
+    def stats(self) -> str:
+        size_mb = self.total_bytes / (1024 * 1024)
+        max_mb = self.max_bytes / (1024 * 1024)
+        return (
+            f"Cache: {len(self.index)} files, {size_mb:.1f} / {max_mb:.0f} MB\n"
+            f"Hits: {self.hits}, misses: {self.misses}"
+        )
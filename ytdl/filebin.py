@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from urllib.parse import quote
+
+import aiohttp
+
+# Filebin API details
+BASE_URL = "https://filebin.net"
+CHUNK_SIZE = 256 * 1024
+RETRIES = 3
+TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=60)
+
+log = logging.getLogger("red.senko-cogs.ytdl")
+
+
+def _backoff(attempt: int) -> float:
+    """Seconds to wait before retry number ``attempt``."""
+    return 2 ** attempt + random.random()
+
+
+class UploadStatus:
+    """Progress of one upload, rendered into the status message like a JobStatus."""
+
+    def __init__(self, label: str = "Uploading to Filebin"):
+        self.label = label
+        self.sent = 0
+        self.total = 0
+        self.attempt = 1
+        self.started = time.monotonic()
+        self.done = False
+
+    @property
+    def speed(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def render(self) -> str:
+        text = f"{self.label}: {self.sent / (1024 * 1024):.1f} / {self.total / (1024 * 1024):.1f} MB"
+        if self.total:
+            text += f" ({self.sent * 100 / self.total:.0f}%)"
+        text += f" @ {self.speed / (1024 * 1024):.1f} MB/s"
+        if self.attempt > 1:
+            text += f" (retry {self.attempt - 1})"
+        return text + "..."
+
+
+class FilebinUploader:
+    """Streams files to Filebin over one pooled aiohttp session."""
+
+    def __init__(self, base_url: str = BASE_URL, retries: int = RETRIES):
+        self.base_url = base_url.rstrip("/")
+        self.retries = retries
+        self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=4, ttl_dns_cache=300),
+                timeout=TIMEOUT,
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    @staticmethod
+    def new_bin() -> str:
+        return f"ytdl-{uuid.uuid4().hex[:16]}"
+
+    @staticmethod
+    async def _chunks(file_path: str, status: UploadStatus):
+        loop = asyncio.get_running_loop()
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = await loop.run_in_executor(None, f.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                status.sent += len(chunk)
+                yield chunk
+
+    async def upload(self, file_path: str, filename: str = None, bin_name: str = None, status: UploadStatus = None):
+        """Uploads ``file_path`` into a fresh bin and returns its URL, or None on failure.
+
+        Filebin has no partial uploads, so a failed attempt is restarted from the
+        beginning after an exponential backoff.
+        """
+        filename = filename or os.path.basename(file_path)
+        bin_name = bin_name or self.new_bin()
+        status = status or UploadStatus()
+        status.total = os.path.getsize(file_path)
+        url = f"{self.base_url}/{bin_name}/{quote(filename)}"
+        headers = {
+            "Content-Type": "application/octet-stream",
+            "Content-Length": str(status.total),
+        }
+
+        for attempt in range(1, self.retries + 1):
+            status.attempt = attempt
+            status.sent = 0
+            status.started = time.monotonic()
+            try:
+                async with self.session.post(url, data=self._chunks(file_path, status), headers=headers) as resp:
+                    if resp.status == 201:
+                        return url
+                    text = await resp.text()
+                    log.warning("Filebin upload failed: %s, %s", resp.status, text)
+                    if resp.status < 500 and resp.status != 429:
+                        return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                log.warning("Filebin upload error (attempt %d): %r", attempt, e)
+            if attempt < self.retries:
+                await asyncio.sleep(_backoff(attempt))
+        return None
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import os
+
+# Leave some room for container overhead and bad size estimates
+SIZE_MARGIN = 0.95
+AUDIO_KBPS = 96
+MIN_VIDEO_KBPS = 100
+# What to download when nothing fits and we have to transcode anyway
+FALLBACK_FORMAT = "bestvideo[height<=480]+bestaudio/best[height<=480]/best"
+
+log = logging.getLogger("red.senko-cogs.ytdl")
+
+
+def _has_video(fmt: dict) -> bool:
+    return fmt.get("vcodec") not in (None, "none")
+
+
+def _has_audio(fmt: dict) -> bool:
+    return fmt.get("acodec") not in (None, "none")
+
+
+def estimate_size(fmt: dict, duration) -> float:
+    """Best guess of a format's size in bytes from yt-dlp's metadata, or None."""
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if size:
+        return size
+    if fmt.get("tbr") and duration:
+        return fmt["tbr"] * 1000 / 8 * duration
+    return None
+
+
+def _score(video: dict, audio: dict = None):
+    # Resolution first, then H.264/AAC (plays inline everywhere), then bitrate
+    compatible = (video.get("vcodec") or "").startswith(("avc1", "h264")) and (
+        (audio or video).get("acodec") or ""
+    ).startswith("mp4a")
+    tbr = (video.get("tbr") or 0) + ((audio or {}).get("tbr") or 0)
+    return (video.get("height") or 0, compatible, tbr)
+
+
+def pick_format(info: dict, size_limit: int):
+    """Picks the best format (or video+audio pair) whose estimated size fits in ``size_limit``.
+
+    Returns ``(format_spec, estimated_size)``, or None if nothing is known to fit.
+    """
+    duration = info.get("duration")
+    budget = size_limit * SIZE_MARGIN
+    formats = info.get("formats") or [info]
+
+    video_only = [f for f in formats if _has_video(f) and not _has_audio(f)]
+    audio_only = [f for f in formats if _has_audio(f) and not _has_video(f)]
+    combined = [f for f in formats if _has_video(f) and _has_audio(f)]
+
+    best = None
+    for fmt in combined:
+        size = estimate_size(fmt, duration)
+        if size and size <= budget:
+            candidate = (_score(fmt), fmt["format_id"], size)
+            best = max(best, candidate) if best else candidate
+
+    audio_sizes = [(a, estimate_size(a, duration)) for a in audio_only]
+    for video in video_only:
+        video_size = estimate_size(video, duration)
+        if not video_size or video_size > budget:
+            continue
+        for audio, audio_size in audio_sizes:
+            if audio_size and video_size + audio_size <= budget:
+                candidate = (_score(video, audio), f"{video['format_id']}+{audio['format_id']}", video_size + audio_size)
+                best = max(best, candidate) if best else candidate
+
+    if best is None:
+        return None
+    return best[1], best[2]
+
+
+def video_bitrate_for(duration, size_limit: int):
+    """Video bitrate in kbit/s that makes ``duration`` seconds fit in ``size_limit``, or None if too low."""
+    if not duration:
+        return None
+    total_kbps = size_limit * SIZE_MARGIN * 8 / 1000 / duration
+    video_kbps = int(total_kbps - AUDIO_KBPS)
+    if video_kbps < MIN_VIDEO_KBPS:
+        return None
+    return video_kbps
+
+
+async def _ffmpeg(*args) -> bool:
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-y", "-loglevel", "error", *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+    if process.returncode != 0:
+        log.warning("ffmpeg failed: %s", stderr.decode(errors="replace").strip())
+        return False
+    return True
+
+
+async def transcode_to_size(file_path: str, out_path: str, video_kbps: int) -> bool:
+    """Two-pass H.264/AAC encode of ``file_path`` at ``video_kbps``.
+
+    ``out_path`` only exists afterwards if the encode succeeded.
+    """
+    passlog = out_path + ".passlog"
+    video_args = ["-c:v", "libx264", "-preset", "medium", "-b:v", f"{video_kbps}k", "-passlogfile", passlog]
+    ok = False
+    try:
+        if not await _ffmpeg("-i", file_path, *video_args, "-pass", "1", "-an", "-f", "null", os.devnull):
+            return False
+        ok = await _ffmpeg(
+            "-i", file_path, *video_args, "-pass", "2",
+            "-c:a", "aac", "-b:a", f"{AUDIO_KBPS}k", "-movflags", "+faststart", out_path,
+        )
+        return ok
+    finally:
+        for suffix in ("-0.log", "-0.log.mbtree"):
+            if os.path.exists(passlog + suffix):
+                os.remove(passlog + suffix)
+        if not ok and os.path.exists(out_path):
+            os.remove(out_path)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+import sys
+
+log = logging.getLogger("red.senko-cogs.ytdl")
+
+# filetype: (format that can be stream-copied, ffmpeg encode args, ffmpeg muxer)
+AUDIO_TARGETS = {
+    "mp3": (None, ["-c:a", "libmp3lame", "-q:a", "0"], "mp3"),
+    "opus": ("bestaudio[acodec=opus]", ["-c:a", "libopus", "-b:a", "160k"], "opus"),
+    "m4a": ("bestaudio[acodec^=mp4a]", ["-c:a", "aac", "-b:a", "192k"], "ipod"),
+}
+
+# Fragments fetched at once for DASH/HLS sources
+FRAGMENT_CONCURRENCY = 4
+
+# yt-dlp prints this on stderr for every progress update; the title goes last since it may contain spaces
+PROGRESS_TEMPLATE = (
+    "download:ytdl-progress %(progress.downloaded_bytes)s %(progress.total_bytes_estimate)s "
+    "%(progress.speed)s %(info.extractor_key)s %(info.id)s %(info.title)s"
+)
+
+
+def _num(value: str):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class StreamResult:
+    """Metadata picked up from yt-dlp's progress lines while streaming."""
+
+    def __init__(self):
+        self.extractor = None
+        self.id = None
+        self.title = None
+        self.errors = []
+
+
+async def _read_progress(stream, status, result: StreamResult):
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        text = line.decode(errors="replace").rstrip()
+        if not text.startswith("ytdl-progress "):
+            result.errors = (result.errors + [text])[-10:]
+            continue
+        parts = text.split(" ", 6)
+        if len(parts) < 7:
+            continue
+        _, downloaded, total, speed, result.extractor, result.id, result.title = parts
+        if status is not None:
+            status.state = "downloading"
+            status.downloaded = _num(downloaded) or 0
+            status.total = _num(total)
+            status.speed = _num(speed)
+
+
+async def _pipe(url: str, selector: str, codec_args: list, muxer: str, out_path: str, status=None):
+    """Runs ``yt-dlp -o -`` with its stdout connected straight to ffmpeg's stdin."""
+    result = StreamResult()
+    read_fd, write_fd = os.pipe()
+    try:
+        ytdlp = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "yt_dlp",
+            "--quiet", "--no-playlist", "--newline", "--progress",
+            "--concurrent-fragments", str(FRAGMENT_CONCURRENCY),
+            "--progress-template", PROGRESS_TEMPLATE,
+            "-f", selector, "-o", "-", url,
+            stdout=write_fd,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            ffmpeg = await asyncio.create_subprocess_exec(
+                "ffmpeg", "-y", "-loglevel", "error", "-i", "pipe:0", "-vn", *codec_args, "-f", muxer, out_path,
+                stdin=read_fd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except Exception:
+            ytdlp.kill()
+            raise
+    finally:
+        # The children hold their own copies; ffmpeg only sees EOF once ours are closed too
+        os.close(read_fd)
+        os.close(write_fd)
+
+    try:
+        _, (_, ffmpeg_err) = await asyncio.gather(
+            _read_progress(ytdlp.stderr, status, result),
+            ffmpeg.communicate(),
+        )
+        await ytdlp.wait()
+    except asyncio.CancelledError:
+        for proc in (ytdlp, ffmpeg):
+            if proc.returncode is None:
+                proc.kill()
+        raise
+
+    if ytdlp.returncode != 0 or ffmpeg.returncode != 0:
+        if ytdlp.returncode != 0:
+            log.warning("yt-dlp failed streaming %s:\n%s", url, "\n".join(result.errors))
+        if ffmpeg.returncode != 0:
+            log.warning("ffmpeg failed writing %s:\n%s", out_path, ffmpeg_err.decode(errors="replace"))
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        return None
+    return result
+
+
+async def stream_audio(url: str, filetype: str, out_path: str, status=None):
+    """Streams the best audio for ``url`` through ffmpeg into ``out_path``.
+
+    If the source is already in the target codec it is only remuxed, otherwise it's
+    re-encoded while it downloads. Returns a StreamResult, or None on failure.
+    """
+    passthrough, codec_args, muxer = AUDIO_TARGETS[filetype]
+    if passthrough:
+        result = await _pipe(url, passthrough, ["-c:a", "copy"], muxer, out_path, status)
+        if result:
+            return result
+    return await _pipe(url, "bestaudio/best", codec_args, muxer, out_path, status)
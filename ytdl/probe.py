@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import yt_dlp
+
+# Format URLs expire after a few hours, so don't keep metadata around for too long
+PROBE_TTL = 30 * 60
+MAX_PROBES = 256
+# Seconds between sweeps of expired files from the disk cache
+SWEEP_INTERVAL = 5 * 60
+# Big fields nothing here uses
+DROPPED_FIELDS = ("automatic_captions", "subtitles", "heatmap", "thumbnails", "description")
+
+
+def sanitize_info(info: dict) -> dict:
+    """JSON-safe copy of an info_dict without the bulky fields."""
+    info = yt_dlp.YoutubeDL.sanitize_info(info)
+    for field in DROPPED_FIELDS:
+        info.pop(field, None)
+    return info
+
+
+class ProbeCache:
+    """TTL cache of extracted video metadata, in memory and optionally on disk.
+
+    Used from the worker threads, so everything goes through a lock.
+    """
+
+    def __init__(self, root: str = None, ttl: float = PROBE_TTL, max_entries: int = MAX_PROBES):
+        self.root = root
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._swept = 0.0
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def _remove(path: str):
+        # Another worker thread may have removed it first
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _sweep(self):
+        """Deletes files on disk that expired without being looked up again."""
+        now = time.time()
+        with self._lock:
+            if now - self._swept < SWEEP_INTERVAL:
+                return
+            self._swept = now
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                try:
+                    stale = entry.stat().st_mtime + self.ttl < now
+                except FileNotFoundError:
+                    continue
+                if stale:
+                    self._remove(entry.path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, hashlib.sha256(key.encode()).hexdigest()[:32] + ".json")
+
+    def _load(self, key: str):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("expires", 0) < time.time():
+            self._remove(self._path(key))
+            return None
+        return data["expires"], data["info"]
+
+    def get(self, key: str):
+        """Returns the cached info_dict for ``key``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] < time.time():
+                del self._entries[key]
+                entry = None
+        if entry is None and self.root:
+            entry = self._load(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._trim()
+        return entry[1]
+
+    def put(self, key: str, info: dict):
+        entry = (time.time() + self.ttl, sanitize_info(info))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._trim()
+        if self.root:
+            tmp = self._path(key) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"expires": entry[0], "info": entry[1]}, f)
+            os.replace(tmp, self._path(key))
+            self._sweep()
+        return entry[1]
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.root:
+            self._remove(self._path(key))
+
+    def _trim(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> str:
+        return f"Metadata cache: {len(self._entries)} in memory, hits: {self.hits}, misses: {self.misses}"
@@ -0,0 +1,189 @@
+import asyncio
+import contextlib
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Default limits, can be changed at runtime with [p]ytdllimits
+GLOBAL_LIMIT = 3
+GUILD_LIMIT = 2
+USER_LIMIT = 2
+
+
+class JobStatus:
+    """Progress of one download job, shared between the worker thread and the cog."""
+
+    def __init__(self, label: str = "Download"):
+        self.label = label
+        self.state = "queued"
+        self.position = 0
+        self.downloaded = 0
+        self.total = None
+        self.speed = None
+        self.done = False
+
+    def hook(self, d: dict):
+        """yt-dlp progress hook. Runs in the worker thread, so only plain attribute writes."""
+        if d.get("status") == "downloading":
+            self.state = "downloading"
+            self.downloaded = d.get("downloaded_bytes") or 0
+            self.total = d.get("total_bytes") or d.get("total_bytes_estimate")
+            self.speed = d.get("speed")
+        elif d.get("status") == "finished":
+            self.state = "processing"
+
+    def render(self) -> str:
+        if self.state == "queued":
+            if self.position > 0:
+                return f"{self.label}: queued (position {self.position})..."
+            return f"{self.label}: starting..."
+        if self.state == "downloading":
+            done_mb = self.downloaded / (1024 * 1024)
+            text = f"{self.label}: downloading {done_mb:.1f} MB"
+            if self.total:
+                text += f" / {self.total / (1024 * 1024):.1f} MB ({self.downloaded * 100 / self.total:.0f}%)"
+            if self.speed:
+                text += f" @ {self.speed / (1024 * 1024):.1f} MB/s"
+            return text + "..."
+        return f"{self.label}: {self.state}..."
+
+
+class BatchStatus:
+    """Progress of a batch of downloads."""
+
+    def __init__(self, total: int, filetype: str = "mp4"):
+        self.total = total
+        self.filetype = filetype
+        self.finished = 0
+        self.failed = 0
+        self.done = False
+
+    def render(self) -> str:
+        text = f"Batch {self.filetype.upper()}: {self.finished}/{self.total} sent"
+        if self.failed:
+            text += f", {self.failed} failed"
+        return text + ("." if self.done else "...")
+
+
+class _Job:
+    __slots__ = ("guild_id", "user_id", "status", "queued_at")
+
+    def __init__(self, guild_id, user_id, status):
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.status = status
+        self.queued_at = time.monotonic()
+
+
+class DownloadScheduler:
+    """Runs blocking yt-dlp work in a thread pool with global, per-guild and per-user limits.
+
+    Waiting jobs are served round-robin by user: the next slot goes to the user who
+    was served least recently, so one big batch can't starve everyone else. A job
+    blocked by its guild or user limit doesn't hold up anyone behind it.
+    """
+
+    def __init__(self, global_limit: int = GLOBAL_LIMIT, guild_limit: int = GUILD_LIMIT, user_limit: int = USER_LIMIT):
+        self.global_limit = global_limit
+        self.guild_limit = guild_limit
+        self.user_limit = user_limit
+        self.executor = ThreadPoolExecutor(max_workers=global_limit, thread_name_prefix="ytdl")
+        self._cond = asyncio.Condition()
+        self._waiting = []
+        self._running = []
+        # user_id -> serial number of that user's last started job, for users with jobs queued or running
+        self._served = {}
+        self._serial = 0
+
+    async def set_limits(self, global_limit: int = None, guild_limit: int = None, user_limit: int = None):
+        """Changes the limits; queued jobs that now fit start right away."""
+        async with self._cond:
+            if global_limit is not None and global_limit != self.global_limit:
+                old = self.executor
+                self.executor = ThreadPoolExecutor(max_workers=global_limit, thread_name_prefix="ytdl")
+                old.shutdown(wait=False)
+                self.global_limit = global_limit
+            if guild_limit is not None:
+                self.guild_limit = guild_limit
+            if user_limit is not None:
+                self.user_limit = user_limit
+            self._update_positions()
+            self._cond.notify_all()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def _eligible(self, job: _Job) -> bool:
+        if len(self._running) >= self.global_limit:
+            return False
+        if job.guild_id is not None:
+            if sum(1 for j in self._running if j.guild_id == job.guild_id) >= self.guild_limit:
+                return False
+        if sum(1 for j in self._running if j.user_id == job.user_id) >= self.user_limit:
+            return False
+        return True
+
+    def _order(self, job: _Job):
+        return (self._served.get(job.user_id, 0), job.queued_at)
+
+    def _next_job(self):
+        eligible = [job for job in self._waiting if self._eligible(job)]
+        if not eligible:
+            return None
+        return min(eligible, key=self._order)
+
+    def _forget_idle(self, user_id):
+        # A user with nothing queued or running starts from scratch next time, like a new one
+        if not any(j.user_id == user_id for j in self._waiting) and not any(j.user_id == user_id for j in self._running):
+            self._served.pop(user_id, None)
+
+    def _update_positions(self):
+        for i, job in enumerate(sorted(self._waiting, key=self._order), start=1):
+            job.status.position = i
+
+    @contextlib.asynccontextmanager
+    async def slot(self, guild_id, user_id, status: JobStatus = None):
+        """Wait for a free slot and hold it for the duration of the ``async with`` block.
+
+        For jobs that do their own async work (e.g. subprocesses) instead of using ``run``.
+        """
+        job = _Job(guild_id, user_id, status or JobStatus())
+        async with self._cond:
+            self._waiting.append(job)
+            self._update_positions()
+            try:
+                while self._next_job() is not job:
+                    await self._cond.wait()
+            finally:
+                self._waiting.remove(job)
+                self._forget_idle(job.user_id)
+                self._update_positions()
+                # Someone else may be eligible now that we left the queue (or were cancelled)
+                self._cond.notify_all()
+            self._running.append(job)
+            self._serial += 1
+            self._served[job.user_id] = self._serial
+            job.status.position = 0
+            job.status.state = "starting"
+
+        try:
+            yield job.status
+        finally:
+            async with self._cond:
+                self._running.remove(job)
+                self._forget_idle(job.user_id)
+                self._cond.notify_all()
+
+    async def run(self, guild_id, user_id, func, *args, status: JobStatus = None, **kwargs):
+        """Wait for a free slot, then run ``func(*args, **kwargs)`` in the worker pool."""
+        async with self.slot(guild_id, user_id, status):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,64 @@
+import asyncio
+
+
+class Flight:
+    """One in-flight job and everyone waiting on it."""
+
+    def __init__(self, key, task: asyncio.Task, status=None, cleanup=None):
+        self.key = key
+        self.task = task
+        self.status = status
+        self.cleanup = cleanup
+        self.refs = 0
+
+    async def wait(self):
+        # Shield so one waiter being cancelled doesn't cancel the job for the others
+        return await asyncio.shield(self.task)
+
+
+class SingleFlight:
+    """Coalesces concurrent jobs with the same key into one task.
+
+    ``join`` either starts the job or attaches to the one already running, and every
+    waiter must call ``leave`` when it's done with the result. ``cleanup`` runs with the
+    result once the last waiter has left, so files aren't deleted while someone is
+    still sending them.
+    """
+
+    def __init__(self):
+        self._flights = {}
+
+    def __contains__(self, key):
+        return key in self._flights
+
+    def __len__(self):
+        return len(self._flights)
+
+    def join(self, key, factory, status=None, cleanup=None) -> Flight:
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(factory())
+            flight = Flight(key, task, status, cleanup)
+            self._flights[key] = flight
+            task.add_done_callback(lambda t, f=flight: self._on_done(f))
+        flight.refs += 1
+        return flight
+
+    def _on_done(self, flight: Flight):
+        if flight.status is not None:
+            flight.status.done = True
+        # Failed jobs shouldn't be handed to people who ask again later
+        if flight.task.cancelled() or flight.task.exception() is not None:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    def leave(self, flight: Flight):
+        flight.refs -= 1
+        if flight.refs > 0:
+            return
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+        if not flight.task.done():
+            flight.task.cancel()
+        elif flight.cleanup and not flight.task.cancelled() and flight.task.exception() is None:
+            flight.cleanup(flight.task.result())